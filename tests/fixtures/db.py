@@ -1,6 +1,9 @@
 import pytest
+import sqlalchemy
 
-from vocolab.db import zrDB, create_db
+from vocolab.db import zrDB, create_db, schema
+from vocolab.db.base import get_engine
+from vocolab.db.q import cache
 
 
 @pytest.fixture(scope="session")
@@ -10,4 +13,47 @@ async def db():
     await zrDB.connect()
 
 
+class DBRows:
+    """ Rows inserted by a test (deleted on teardown, see the db_rows fixture) """
 
+    def __init__(self):
+        self.rows = []
+
+    async def insert(self, table: sqlalchemy.Table, **values):
+        """ Insert a row & record it for deletion
+
+        :returns the primary key of the row
+        """
+        row_id = await zrDB.execute(table.insert().values(**values))
+        row_id = values.get('id', row_id)
+        self.rows.append((table, row_id))
+        return row_id
+
+    def ids(self, table: sqlalchemy.Table):
+        return [row_id for t, row_id in self.rows if t is table]
+
+    def delete_all(self):
+        entries = schema.leaderboard_entry_table
+        with get_engine().begin() as conn:
+            # index entries are created by the code under test
+            conn.execute(entries.delete().where(sqlalchemy.or_(
+                entries.c.leaderboard_id.in_(self.ids(schema.leaderboards_table)),
+                entries.c.submission_id.in_(self.ids(schema.submissions_table))
+            )))
+            for table, row_id in reversed(self.rows):
+                conn.execute(table.delete().where(table.c.id == row_id))
+        self.rows.clear()
+
+        # deleted ids can be re-used by the next inserts
+        for metadata_cache in (cache.challenges_cache, cache.evaluators_cache, cache.leaderboards_cache,
+                               cache.users_cache):
+            metadata_cache.clear()
+
+
+@pytest.fixture
+def db_rows():
+    """ Record the rows inserted by a test & delete them on teardown """
+    create_db()
+    rows = DBRows()
+    yield rows
+    rows.delete_all()
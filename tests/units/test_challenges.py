@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+import sqlalchemy
+
+from vocolab.db import zrDB, schema
+from vocolab.db.q import challengesQ
+
+
+async def _user_submissions(db_rows):
+    await zrDB.connect()
+    tag = uuid4().hex[:8]
+    user_id, other_user_id = 10_000_000, 10_000_001
+    try:
+        tracks = {}
+        # labels are inserted out of order, previews are ordered by track label
+        for label in ('track-b', 'track-a'):
+            tracks[label] = await db_rows.insert(
+                schema.challenges_table,
+                label=f"{tag}-{label}", start_date=date.today(), active=True, url='http://example.org'
+            )
+
+        submissions = [('track-b', user_id), ('track-a', user_id), ('track-b', user_id), ('track-a', other_user_id)]
+        for i, (label, owner) in enumerate(submissions):
+            await db_rows.insert(
+                schema.submissions_table,
+                id=f"{tag}-{i}", user_id=owner, track_id=tracks[label],
+                submit_date=datetime.now() + timedelta(seconds=i), status='uploaded', auto_eval=False
+            )
+
+        return (
+            tag, tracks,
+            await challengesQ.get_user_submissions_by_track(user_id=user_id),
+            await challengesQ.get_user_submission_previews(user_id=user_id, by_track=tracks['track-b']),
+        )
+    finally:
+        await zrDB.disconnect()
+
+
+def test_user_submission_previews(db_rows):
+    tag, tracks, by_track, track_b = asyncio.run(_user_submissions(db_rows))
+
+    assert list(by_track.keys()) == [f"{tag}-track-a", f"{tag}-track-b"]
+    assert [p.submission_id for p in by_track[f"{tag}-track-a"]] == [f"{tag}-1"], \
+        "submissions of other users should not be listed"
+    assert [p.submission_id for p in by_track[f"{tag}-track-b"]] == [f"{tag}-0", f"{tag}-2"]
+    assert all(p.track_id == tracks['track-b'] and p.status == 'uploaded' for p in by_track[f"{tag}-track-b"])
+    assert track_b == by_track[f"{tag}-track-b"]
+
+
+async def _active_challenges(db_rows):
+    await zrDB.connect()
+    tag = uuid4().hex[:8]
+    today, one_day = date.today(), timedelta(days=1)
+    try:
+        ids = []
+        for i, (start_date, end_date, active) in enumerate([
+            (today, None, True),
+            (today, today, True),
+            (today - one_day, today - one_day, True),
+            (today + one_day, None, True),
+            (today - one_day, today + one_day, True),
+            (today - one_day, None, False),
+        ]):
+            ids.append(await db_rows.insert(
+                schema.challenges_table,
+                label=f"challenge-{tag}-{i}", start_date=start_date, end_date=end_date, active=active,
+                url='http://example.org'
+            ))
+
+        table = schema.challenges_table
+        in_sql = {r['id'] for r in await zrDB.fetch_all(
+            sqlalchemy.select(table.c.id).where(table.c.id.in_(ids) & challengesQ._active_clause(today))
+        )}
+        challenges = await challengesQ.list_challenges(include_all=True)
+        in_python = {ch.id for ch in challenges if ch.id in ids and ch.is_active()}
+        listed = {ch.id for ch in await challengesQ.list_challenges() if ch.id in ids}
+        return ids, in_sql, in_python, listed
+    finally:
+        await zrDB.disconnect()
+
+
+def test_active_clause_matches_is_active(db_rows):
+    ids, in_sql, in_python, listed = asyncio.run(_active_challenges(db_rows))
+
+    assert in_python == {ids[0], ids[1], ids[4]}
+    assert in_sql == in_python, "challenges should be active on their start & end dates"
+    assert listed == in_python
@@ -0,0 +1,61 @@
+import asyncio
+
+import sqlalchemy
+
+from vocolab import get_settings
+from vocolab.db import zrDB, create_db
+from vocolab.db.base import _create_missing_indexes
+from vocolab.db.schema import users_metadata, challenge_metadata
+
+_settings = get_settings()
+
+
+async def _pooled_connections():
+    create_db()
+    await zrDB.connect()
+    pool = zrDB._backend._pool
+    try:
+        pragmas = {
+            name: await zrDB.fetch_val(f"PRAGMA {name}")
+            for name in ('journal_mode', 'synchronous', 'busy_timeout')
+        }
+
+        first = await pool.acquire()
+        await pool.release(first)
+        second = await pool.acquire()
+        await pool.release(second)
+    finally:
+        await zrDB.disconnect()
+    return pragmas, first is second, len(pool._idle)
+
+
+def test_connections_are_tuned_and_pooled():
+    options = _settings.database_options
+    pragmas, reused, idle = asyncio.run(_pooled_connections())
+
+    assert pragmas['journal_mode'].lower() == options.journal_mode.lower()
+    assert pragmas['synchronous'] == {'OFF': 0, 'NORMAL': 1, 'FULL': 2, 'EXTRA': 3}[options.synchronous.upper()]
+    assert pragmas['busy_timeout'] == options.busy_timeout
+    assert reused, "released connections should be re-used"
+    assert idle == 0, "idle connections should be closed on disconnect"
+
+
+def test_missing_indexes_are_created(tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'existing.db'}")
+    users_metadata.create_all(engine)
+    challenge_metadata.create_all(engine)
+    # database created before the indexes were declared
+    with engine.begin() as conn:
+        for index in ('ix_challenge_submissions_track_status', 'ix_leaderboards_challenge_id'):
+            conn.execute(sqlalchemy.text(f"DROP INDEX {index}"))
+
+    # indexes that already exist are skipped (checkfirst)
+    _create_missing_indexes(engine)
+    _create_missing_indexes(engine)
+
+    inspector = sqlalchemy.inspect(engine)
+    for metadata in (users_metadata, challenge_metadata):
+        for table in metadata.sorted_tables:
+            existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            assert {ix.name for ix in table.indexes} <= existing, f"missing indexes on {table.name}"
+    engine.dispose()
@@ -1,4 +1,24 @@
-from vocolab.lib._fs.file_spilt import split_zip, merge_zip
+import asyncio
+import io
+import os
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from Crypto.Hash import MD5
+
+from vocolab import exc
+from vocolab.db import models
+from vocolab.lib import submissions_lib
+from vocolab.lib._fs import submissions
+from vocolab.lib._fs.commons import md5sum, write_hashed, write_hashed_async, unzip
+from vocolab.lib._fs.file_spilt import split_zip, merge_zip, unzip_parts
+from vocolab.lib._fs.leaderboards import (
+    write_leaderboard, load_compiled_leaderboard, load_entry_file, publish_static_files, get_static_manifest_location
+)
 
 
 def test_zip_split_merge(large_binary_file):
@@ -7,12 +27,266 @@ def test_zip_split_merge(large_binary_file):
     assert bin_file.is_file(), f"Bin file [{bin_file}] needs to exist"
 
     res = split_zip(bin_file, chunk_max_size=50000000, hash_parts=True)
-    assert res.location.is_dir(), "Parts files dir needs to exist after split!"
-    assert len(list(res.location.glob('*'))) != 0, "Parts dir cannot be empty!"
+    assert res.tmp_location.is_dir(), "Parts files dir needs to exist after split!"
+    assert len(list(res.tmp_location.glob('*'))) != 0, "Parts dir cannot be empty!"
 
-    (res.location / 'fs_manifest.csv').unlink()
-    res.og_filename = 'reconstructed.bin'
+    (res.tmp_location / 'fs_manifest.csv').unlink()
+    res.filename = 'reconstructed.bin'
 
     res = merge_zip(res, test_location, clean=False)
 
     assert res.is_file(), f"file {res.name} should be in {res}"
+    assert md5sum(res) == md5sum(bin_file), "merged file should match the original"
+    res.unlink()
+
+
+def test_zip_merge_zero_copy(large_binary_file):
+    bin_file, test_location = large_binary_file
+
+    res = split_zip(bin_file, chunk_max_size=50000000, hash_parts=True)
+    res.filename = 'reconstructed_zc.bin'
+
+    merged = merge_zip(res, test_location, clean=True, verify=False)
+
+    assert not res.tmp_location.is_dir(), "Parts dir should be removed after merge"
+    assert md5sum(merged) == md5sum(bin_file), "merged file should match the original"
+    merged.unlink()
+
+
+def test_merge_mismatch_removes_output(tmp_path):
+    archive = tmp_path / 'archive.bin'
+    archive.write_bytes(os.urandom(2000000))
+    res = split_zip(archive, chunk_max_size=500000, hash_parts=True)
+    res.filename = 'merged.bin'
+    res.hash = '0' * 32
+
+    with pytest.raises(ValueError):
+        merge_zip(res, tmp_path, clean=False)
+    assert not (tmp_path / 'merged.bin').exists(), "corrupted merged file should be removed"
+
+
+def test_write_hashed(large_binary_file):
+    bin_file, test_location = large_binary_file
+    target = test_location / 'copy.bin'
+
+    with bin_file.open('rb') as fp:
+        calc_hash = write_hashed(fp, target)
+
+    assert target.is_file(), f"file {target} should have been written"
+    assert calc_hash == md5sum(bin_file), "hash computed while writing should match source hash"
+    assert md5sum(target) == md5sum(bin_file), "written file should match source"
+    target.unlink()
+
+
+def test_write_hashed_async(large_binary_file):
+    bin_file, test_location = large_binary_file
+    target = test_location / 'async_copy.bin'
+
+    class AsyncReader:
+        """ Mimics the async read interface of fastapi.UploadFile """
+        def __init__(self, fp):
+            self.fp = fp
+
+        async def read(self, size: int = -1):
+            return self.fp.read(size)
+
+    with bin_file.open('rb') as fp:
+        calc_hash = asyncio.run(write_hashed_async(AsyncReader(fp), target))
+
+    assert calc_hash == md5sum(bin_file), "hash computed while writing should match source hash"
+    assert md5sum(target) == md5sum(bin_file), "written file should match source"
+    target.unlink()
+
+
+def test_unzip_parts(tmp_path):
+    archive = tmp_path / 'archive.zip'
+    files = {f"dir_{i % 3}/file_{i}.bin": os.urandom(20000 * (i + 1)) for i in range(20)}
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+
+    res = split_zip(archive, chunk_max_size=500000, hash_parts=True)
+    assert len(res.index) > 1, "archive should be split in multiple parts"
+
+    unzip_parts(res, tmp_path / 'output')
+
+    assert not res.tmp_location.is_dir(), "Parts dir should be removed after extraction"
+    for name, content in files.items():
+        assert (tmp_path / 'output' / name).read_bytes() == content, f"{name} was not extracted correctly"
+
+
+def test_unzip_parts_mismatch(tmp_path):
+    archive = tmp_path / 'archive.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        for i in range(10):
+            zf.writestr(f"file_{i}.bin", os.urandom(100000))
+
+    res = split_zip(archive, chunk_max_size=300000, hash_parts=True)
+    res.hash = '0' * 32
+    (tmp_path / 'output').mkdir()
+
+    with pytest.raises(ValueError):
+        unzip_parts(res, tmp_path / 'output', clean=False)
+    assert list((tmp_path / 'output').iterdir()) == [], "nothing should be extracted from unverified parts"
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(['archive.zip', 'output', res.tmp_location.name])
+
+
+def test_parallel_unzip(tmp_path):
+    archive = tmp_path / 'archive.zip'
+    files = {f"dir_{i % 5}/sub/file_{i}.npy": os.urandom(1000 + i) for i in range(200)}
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+
+    progress = []
+    unzip(archive, tmp_path / 'output', workers=4, on_progress=lambda done, total: progress.append((done, total)))
+
+    assert progress[-1] == (len(files), len(files)), "progress should report all extracted files"
+    for name, content in files.items():
+        assert (tmp_path / 'output' / name).read_bytes() == content, f"{name} was not extracted correctly"
+
+
+def test_compiled_leaderboard_cache(tmp_path):
+    location = tmp_path / 'leaderboard.json'
+    assert load_compiled_leaderboard(location) is None, "missing leaderboards should not be loaded"
+
+    write_leaderboard(location, [dict(index=1)])
+    compiled = load_compiled_leaderboard(location)
+    assert compiled.content == location.read_bytes()
+    assert load_compiled_leaderboard(location) is compiled, "unchanged leaderboards should be served from cache"
+
+    write_leaderboard(location, [dict(index=1), dict(index=2)])
+    updated = load_compiled_leaderboard(location)
+    assert updated.content == location.read_bytes(), "cache should be invalidated when the file changes"
+    assert updated.etag != compiled.etag
+
+
+def test_load_yml_entry(tmp_path):
+    location = tmp_path / 'entry.yml'
+    location.write_text("model_id: baseline\nscores:\n  abx: 0.5\n")
+
+    entry = load_entry_file(location)
+    assert entry == dict(model_id='baseline', scores=dict(abx=0.5)), ".yml entries should be loaded"
+
+    entry['index'] = 1
+    assert 'index' not in load_entry_file(location), "cached entries should not be modified by callers"
+
+
+def test_publish_static_files(tmp_path):
+    sources = []
+    for i in (1, 2):
+        source = tmp_path / f'sub{i}' / 'static'
+        source.mkdir(parents=True)
+        (source / 'plot.png').write_bytes(f'plot-{i}'.encode())
+        sources.append(source)
+    (sources[0] / 'figures').mkdir()
+    (sources[0] / 'figures' / 'curve.png').write_bytes(b'curve')
+
+    target = tmp_path / 'published'
+    assert publish_static_files(sources, target) == 2
+    assert (target / 'plot.png').read_bytes() == b'plot-2', "later sources should override earlier ones"
+    assert (target / 'curve.png').read_bytes() == b'curve', "files should be published by name"
+    assert publish_static_files(sources, target) == 0, "unchanged files should be skipped"
+    assert not any(p.name.startswith('.') for p in target.iterdir()), "manifest should not be in the served directory"
+
+    (sources[0] / 'figures' / 'curve.png').unlink()
+    assert publish_static_files(sources, target) == 0
+    assert sorted(p.name for p in target.iterdir()) == ['plot.png'], "files of removed sources should be pruned"
+    get_static_manifest_location(target).unlink()
+
+
+def test_entry_cache_is_bounded(tmp_path, monkeypatch):
+    from vocolab.lib._fs import leaderboards
+    monkeypatch.setattr(leaderboards, '_ENTRY_CACHE_SIZE', 2)
+
+    for i in range(5):
+        (tmp_path / f'entry{i}.json').write_text(f'{{"score": {i}}}')
+        assert load_entry_file(tmp_path / f'entry{i}.json') == dict(score=i)
+
+    cached = [p for p in leaderboards._entry_cache if p.parent == tmp_path]
+    assert cached == [tmp_path / 'entry3.json', tmp_path / 'entry4.json'], "least recently used entries should be evicted"
+
+
+def md5sum_bytes(data: bytes) -> str:
+    return MD5.new(data).hexdigest()
+
+
+@pytest.fixture()
+def multipart_submission():
+    parts = {'part-1': os.urandom(4096), 'part-2': os.urandom(4096)}
+    submission_id = f"test-{uuid4().hex}"
+    submissions.make_submission_on_disk(
+        submission_id, 'tester', 'test-track', models.api.NewSubmissionRequest(
+            filename='archive.zip', hash=md5sum_bytes(b''.join(parts.values())), multipart=True,
+            index=[dict(file_name=name, file_size=len(data), file_hash=md5sum_bytes(data)) for name, data in parts.items()]
+        )
+    )
+    yield submission_id, parts
+    shutil.rmtree(submissions.get_submission_dir(submission_id))
+
+
+def _upload(data: bytes):
+    """ Mimics the interface of fastapi.UploadFile """
+    return SimpleNamespace(file=io.BytesIO(data))
+
+
+def _leftover_parts(submission_id):
+    return list(submissions.get_submission_dir(submission_id, as_obj=True).multipart_dir.glob('*.part'))
+
+
+def test_multipart_receipts(multipart_submission):
+    submission_id, parts = multipart_submission
+    submission_dir = submissions.get_submission_dir(submission_id, as_obj=True)
+
+    completed, remaining = submissions.multipart_add(submission_id, 'part-1', _upload(parts['part-1']))
+    assert not completed and [r.file_name for r in remaining] == ['part-2']
+    assert (submission_dir.multipart_receipts / 'part-1').read_text() == md5sum_bytes(parts['part-1'])
+
+    with pytest.raises(exc.ValueNotValid):
+        submissions.multipart_add(submission_id, 'part-2', _upload(b'corrupted'))
+    assert not (submission_dir.multipart_receipts / 'part-2').exists(), "corrupted parts should not be acknowledged"
+
+    completed, remaining = submissions.multipart_add(submission_id, 'part-2', _upload(parts['part-2']))
+    assert completed and remaining == []
+    assert _leftover_parts(submission_id) == []
+
+
+def test_multipart_interrupted_upload(multipart_submission):
+    submission_id, parts = multipart_submission
+
+    class BrokenStream(io.BytesIO):
+        def read(self, size=-1):
+            raise ConnectionResetError("client disconnected")
+
+    with pytest.raises(ConnectionResetError):
+        submissions.multipart_add(submission_id, 'part-1', SimpleNamespace(file=BrokenStream()))
+    assert _leftover_parts(submission_id) == [], "partial parts should be removed"
+
+
+def test_multipart_concurrent_part_upload(multipart_submission):
+    submission_id, parts = multipart_submission
+    submission_dir = submissions.get_submission_dir(submission_id, as_obj=True)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(
+            lambda _: submissions.multipart_add(submission_id, 'part-1', _upload(parts['part-1'])), range(4)
+        ))
+
+    assert all(not completed for completed, _ in results)
+    assert (submission_dir.multipart_dir / 'part-1').read_bytes() == parts['part-1']
+    assert [f.name for f in submission_dir.multipart_receipts.iterdir()] == ['part-1']
+    assert _leftover_parts(submission_id) == []
+
+
+def test_upload_completion_claim(multipart_submission):
+    submission_id, _ = multipart_submission
+    submission_dir = submissions.get_submission_dir(submission_id, as_obj=True)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        claims = list(pool.map(lambda _: submissions_lib._claim_upload_completion(submission_dir), range(4)))
+    assert claims.count(True) == 1, "only one request should finalise the upload"
+    assert not submission_dir.upload_lock.exists()
+
+    submissions_lib._release_upload_completion(submission_dir, reason='test')
+    assert submission_dir.upload_lock.is_file(), "released submissions should accept parts again"
+    assert submissions_lib._claim_upload_completion(submission_dir)
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import shutil
+from datetime import date, datetime
+from uuid import uuid4
+
+from vocolab import get_settings
+from vocolab.db import zrDB, schema
+from vocolab.db.q import leaderboardQ
+from vocolab.lib import leaderboards_lib
+
+_settings = get_settings()
+
+
+async def _build_challenge_with_unindexed_submissions(db_rows, tmp_path, nb_leaderboards=3, nb_submissions=3):
+    await zrDB.connect()
+    tag = uuid4().hex[:8]
+    try:
+        challenge_id = await db_rows.insert(
+            schema.challenges_table,
+            label=f"challenge-{tag}", start_date=date.today(), active=True, url='http://example.org'
+        )
+        for i in range(nb_leaderboards):
+            await db_rows.insert(
+                schema.leaderboards_table,
+                challenge_id=challenge_id, label=f"leaderboard-{tag}-{i}", path_to=str(tmp_path / f"lb{i}.json"),
+                entry_file=f"entry{i}.json", archived=False, external_entries=str(tmp_path / 'external'),
+                static_files=False, sorting_key='score'
+            )
+
+        # completed submissions that are not in the entry index yet (ex: evaluated before the index existed)
+        for j in range(nb_submissions):
+            submission_id = f"{tag}-{j}"
+            await db_rows.insert(
+                schema.submissions_table,
+                id=submission_id, user_id=1, track_id=challenge_id, submit_date=datetime.now(),
+                status='completed', auto_eval=False
+            )
+            location = _settings.submission_dir / submission_id
+            location.mkdir(parents=True)
+            for i in range(nb_leaderboards):
+                (location / f"entry{i}.json").write_text(json.dumps(dict(score=j)))
+
+        # completed submission without entry files
+        await db_rows.insert(
+            schema.submissions_table,
+            id=f"{tag}-empty", user_id=1, track_id=challenge_id, submit_date=datetime.now(),
+            status='completed', auto_eval=False
+        )
+
+        built = await asyncio.wait_for(leaderboards_lib.build_all_challenge(challenge_id), timeout=30)
+        unindexed = [
+            await leaderboardQ.list_unindexed_submissions(leaderboard_id=ld_id, challenge_id=challenge_id)
+            for ld_id in db_rows.ids(schema.leaderboards_table)
+        ]
+        return built, unindexed
+    finally:
+        await zrDB.disconnect()
+        for j in range(nb_submissions):
+            shutil.rmtree(_settings.submission_dir / f"{tag}-{j}", ignore_errors=True)
+
+
+def test_build_all_challenge_backfills_entries(db_rows, tmp_path):
+    (tmp_path / 'external').mkdir()
+    built, unindexed = asyncio.run(_build_challenge_with_unindexed_submissions(db_rows, tmp_path))
+
+    assert unindexed == [[], [], []], "submissions without entries should not be re-read by the next builds"
+    assert len(built) == 3
+    for location in built:
+        entries = json.loads(location.read_text())['data']
+        assert [e['score'] for e in entries] == [0, 1, 2], "all submissions should be backfilled & ranked"
+
+
+async def _update_and_rebuild(db_rows, tmp_path, monkeypatch):
+    await zrDB.connect()
+    tag = uuid4().hex[:8]
+    submissions = []
+
+    async def add_submission(score):
+        submission_id = f"{tag}-{len(submissions)}"
+        submissions.append(submission_id)
+        await db_rows.insert(
+            schema.submissions_table,
+            id=submission_id, user_id=1, track_id=challenge_id, submit_date=datetime.now(),
+            status='completed', auto_eval=False
+        )
+        location = _settings.submission_dir / submission_id
+        location.mkdir(parents=True, exist_ok=True)
+        (location / 'entry.json').write_text(json.dumps(dict(model_id=submission_id, score=score)))
+        return submission_id
+
+    try:
+        challenge_id = await db_rows.insert(
+            schema.challenges_table,
+            label=f"challenge-{tag}", start_date=date.today(), active=True, url='http://example.org'
+        )
+        leaderboard_id = await db_rows.insert(
+            schema.leaderboards_table,
+            challenge_id=challenge_id, label=f"leaderboard-{tag}", path_to=str(tmp_path / "lb.json"),
+            entry_file="entry.json", archived=False, external_entries=str(tmp_path / 'external'),
+            static_files=False, sorting_key='-score'
+        )
+        for score in [3, 1, 'n/a', 2]:
+            await add_submission(score)
+        location = await leaderboards_lib.build_leaderboard(leaderboard_id=leaderboard_id)
+
+        # updates should not re-gather the entries of the leaderboard
+        async def no_gather(*args, **kwargs):
+            raise AssertionError("leaderboard was fully rebuilt")
+
+        with monkeypatch.context() as m:
+            m.setattr(leaderboards_lib, 'gather_leaderboard_entries', no_gather)
+            # new entries (one tied with an existing entry) & a re-evaluated submission
+            for score in [2, 10]:
+                await leaderboards_lib.update_leaderboard(
+                    leaderboard_id=leaderboard_id, submission_id=await add_submission(score)
+                )
+            (_settings.submission_dir / submissions[1] / 'entry.json').write_text(
+                json.dumps(dict(model_id=submissions[1], score=5))
+            )
+            await leaderboards_lib.update_leaderboard(leaderboard_id=leaderboard_id, submission_id=submissions[1])
+        updated = json.loads(location.read_text())['data']
+
+        await leaderboards_lib.build_leaderboard(leaderboard_id=leaderboard_id)
+        rebuilt = json.loads(location.read_text())['data']
+        return updated, rebuilt
+    finally:
+        await zrDB.disconnect()
+        for submission_id in submissions:
+            shutil.rmtree(_settings.submission_dir / submission_id, ignore_errors=True)
+
+
+def test_update_leaderboard_is_incremental(db_rows, tmp_path, monkeypatch):
+    (tmp_path / 'external').mkdir()
+    (tmp_path / 'external' / 'baseline.json').write_text(json.dumps(dict(model_id='baseline', score=2)))
+
+    updated, rebuilt = asyncio.run(_update_and_rebuild(db_rows, tmp_path, monkeypatch))
+    assert updated == rebuilt, "merging entries should give the same leaderboard as a full build"
+    assert [e['score'] for e in updated] == [10, 5, 3, 2, 2, 2, 'n/a']
+    assert [e['rank'] for e in updated] == [1, 2, 3, 4, 4, 4, 7]
+    assert updated[3]['model_id'] == 'baseline'
@@ -0,0 +1,49 @@
+from vocolab.lib.leaderboards_lib import rebuild_leaderboard_index, LeaderboardIndex
+
+
+def test_multi_key_ranking():
+    entries = [
+        dict(model='a', scores=dict(x=1, y='b')),
+        dict(model='b', scores=dict(x=2)),
+        dict(model='c', scores=dict(y='a')),
+        dict(model='d', scores=dict(x=1, y='a')),
+        dict(model='e', scores=dict(x=2)),
+    ]
+    ranked = rebuild_leaderboard_index(entries, key='-scores.x,scores.y')
+
+    assert [e['model'] for e in ranked] == ['b', 'e', 'd', 'a', 'c'], "entries missing a key should be last"
+    assert [e['index'] for e in ranked] == [1, 2, 3, 4, 5]
+    assert [e['rank'] for e in ranked] == [1, 1, 3, 4, 5], "ties should share their rank"
+    assert [e['dense_rank'] for e in ranked] == [1, 1, 2, 3, 4]
+
+
+def test_index_orderings_are_bounded():
+    index = LeaderboardIndex('"etag"', None, [dict(model=m, x=x) for m, x in [('a', 2), ('b', 1), ('c', 3)]])
+
+    for sort_by in ['x', ' x', 'x,', '-x', ' -x ,']:
+        index.ordered_by(sort_by)
+    assert len(index._orderings) == 2, "equivalent sort keys should share their ordering"
+    assert [e['model'] for e in index.ordered_by(' x,')] == ['b', 'a', 'c']
+
+    for i in range(3 * LeaderboardIndex.max_orderings):
+        index.ordered_by(f'k{i}')
+    assert len(index._orderings) == LeaderboardIndex.max_orderings
+
+
+def test_mixed_values_ranking():
+    entries = [
+        dict(model='a', score='n/a'),
+        dict(model='b', score=10),
+        dict(model='c'),
+        dict(model='d', score=9),
+        dict(model='e', score=float('nan')),
+        dict(model='f', score=9.5),
+    ]
+
+    ranked = rebuild_leaderboard_index(entries, key='score')
+    assert [e['model'] for e in ranked] == ['d', 'f', 'b', 'a', 'c', 'e'], \
+        "numbers should be ranked numerically, before other values & missing ones"
+
+    ranked = rebuild_leaderboard_index(entries, key='-score')
+    assert [e['model'] for e in ranked] == ['b', 'f', 'd', 'a', 'c', 'e']
+    assert [e['rank'] for e in ranked] == [1, 2, 3, 4, 5, 5]
@@ -0,0 +1,44 @@
+import asyncio
+from datetime import date
+from uuid import uuid4
+
+from vocolab.db import zrDB, schema
+from vocolab.db.q import challengesQ, leaderboardQ
+
+
+async def _fetch_twice(db_rows):
+    await zrDB.connect()
+    tag = uuid4().hex[:8]
+    try:
+        challenge_id = await db_rows.insert(
+            schema.challenges_table,
+            label=f"challenge-{tag}", start_date=date.today(), active=True, url='http://example.org'
+        )
+        leaderboard_id = await db_rows.insert(
+            schema.leaderboards_table,
+            challenge_id=challenge_id, label=f"leaderboard-{tag}", path_to=f"{tag}.json",
+            entry_file="entry.json", archived=False, static_files=False
+        )
+
+        ch = await challengesQ.get_challenge(challenge_id=challenge_id)
+        ch.label = 'modified'
+        ld = await leaderboardQ.get_leaderboard(leaderboard_id=leaderboard_id)
+        ld.label = 'modified'
+        (lst_ld,) = await leaderboardQ.get_leaderboards(by_challenge_id=challenge_id)
+        lst_ld.label = 'modified'
+
+        return (
+            await challengesQ.get_challenge(challenge_id=challenge_id),
+            await leaderboardQ.get_leaderboard(leaderboard_id=leaderboard_id),
+            await leaderboardQ.get_leaderboards(by_challenge_id=challenge_id),
+            tag
+        )
+    finally:
+        await zrDB.disconnect()
+
+
+def test_cached_metadata_is_copied(db_rows):
+    ch, ld, lst_ld, tag = asyncio.run(_fetch_twice(db_rows))
+    assert ch.label == f"challenge-{tag}", "changes made by callers should not leak into the cache"
+    assert ld.label == f"leaderboard-{tag}"
+    assert [x.label for x in lst_ld] == [f"leaderboard-{tag}"]
@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime
+from typing import Tuple
+from uuid import uuid4
+
+from vocolab.db import zrDB, schema
+from vocolab.db.q import userQ
+from vocolab.db.q.cache import MetadataCache
+from vocolab.lib import users_lib
+
+
+async def _create_user(db_rows, password: str = 'password', **kwargs) -> Tuple[str, str]:
+    """ Create an enabled user, returns its username & email """
+    tag = uuid4().hex[:8]
+    hashed_pswd, salt = users_lib.hash_pwd(password=password, **kwargs)
+    await db_rows.insert(
+        schema.users_table,
+        username=f"user-{tag}", email=f"user-{tag}@example.org", active=True, verified='True',
+        hashed_pswd=hashed_pswd, salt=salt, created_at=datetime.now()
+    )
+    return f"user-{tag}", f"user-{tag}@example.org"
+
+
+async def _disable_from_other_process(db_rows):
+    await zrDB.connect()
+    try:
+        _, email = await _create_user(db_rows)
+        user = await userQ.get_cached_user(by_email=email)
+        user.active = False
+        assert (await userQ.get_cached_user(by_email=email)).active, "callers should get their own copy"
+
+        # another process disables the user (& bumps the version counter of its cache)
+        table = schema.users_table
+        await zrDB.execute(table.update().where(table.c.email == email).values(active=False))
+        await MetadataCache('users', ttl=60, check_interval=0).invalidate()
+
+        return await userQ.get_cached_user(by_email=email)
+    finally:
+        await zrDB.disconnect()
+
+
+def test_cached_user_invalidation(db_rows):
+    user = asyncio.run(_disable_from_other_process(db_rows))
+    assert not user.enabled, "changes made by other processes should invalidate the cache"
+
+
+async def _login_with_outdated_hashes(db_rows):
+    await zrDB.connect()
+    try:
+        results = []
+        # hash with fewer iterations & legacy hash (stored without its parameters)
+        outdated = [
+            await _create_user(db_rows, iterations=1000),
+            await _create_user(db_rows, iterations=users_lib.LEGACY_HASH_ITERATIONS),
+        ]
+        table = schema.users_table
+        legacy_hash = users_lib._pbkdf2('password', b'salt', users_lib.LEGACY_HASH_ITERATIONS)
+        await zrDB.execute(table.update().where(table.c.username == outdated[1][0]).values(
+            hashed_pswd=legacy_hash, salt=b'salt'
+        ))
+
+        for username, _ in outdated:
+            wrong = await userQ.get_user_for_login(username, 'wrong-password')
+            user = await userQ.get_user_for_login(username, 'password')
+            stored = await userQ.get_user(by_username=username)
+            results.append((wrong, user, stored))
+        return results
+    finally:
+        await zrDB.disconnect()
+
+
+def test_login_rehashes_outdated_passwords(db_rows):
+    for wrong, user, stored in asyncio.run(_login_with_outdated_hashes(db_rows)):
+        assert wrong is None
+        assert user is not None, "outdated hashes should still be accepted"
+        assert not users_lib.needs_rehash(stored.hashed_pswd), "hash should be upgraded on login"
+        assert stored.hashed_pswd == user.hashed_pswd
+        assert users_lib.check_pwd(password='password', hashed_pswd=stored.hashed_pswd, salt=stored.salt)
@@ -168,8 +168,18 @@ class BuildLeaderboardCMD(cmd_lib.CMD):
     def __init__(self, root, name, cmd_path):
         super(BuildLeaderboardCMD, self).__init__(root, name, cmd_path)
         self.parser.add_argument('leaderboard_id', type=int, help='The id of the leaderboard')
+        self.parser.add_argument('--by-challenge', action="store_true",
+                                 help="Build all the leaderboards of the challenge with the given id (in parallel)")
+        self.parser.add_argument('--workers', type=int, default=None,
+                                 help="Number of leaderboards built in parallel (with --by-challenge)")
 
     def run(self, argv):
         args = self.parser.parse_args(argv)
+        if args.by_challenge:
+            ld_files = asyncio.run(leaderboards_lib.build_all_challenge(args.leaderboard_id, workers=args.workers))
+            for ld_file in ld_files:
+                out.cli.info(f"Successfully build {ld_file}")
+            return
+
         ld_file = asyncio.run(leaderboards_lib.build_leaderboard(leaderboard_id=args.leaderboard_id))
         out.cli.info(f"Successfully build {ld_file}")
@@ -78,7 +78,7 @@ class GenerateWorkerSettings(cmd_lib.CMD):
     def __init__(self, root, name, cmd_path):
         super(GenerateWorkerSettings, self).__init__(root, name, cmd_path)
         self.parser.add_argument('-o', '--output-file', type=str, help="File to output result config")
-        self.parser.add_argument('worker_type', choices=['eval', 'update'])
+        self.parser.add_argument('worker_type', choices=['eval', 'update', 'ingest'])
         self.config_file = Environment(loader=FileSystemLoader(_settings.config_template_dir)) \
             .get_template("worker.config")
 
@@ -88,6 +88,9 @@ class GenerateWorkerSettings(cmd_lib.CMD):
         if args.worker_type == 'eval':
             node_name = _settings.celery_options.celery_nodes.get('eval')
             queue_name = _settings.task_queue_options.QUEUE_CHANNELS.get('eval')
+        elif args.worker_type == 'ingest':
+            node_name = _settings.celery_options.celery_nodes.get('ingest')
+            queue_name = _settings.task_queue_options.QUEUE_CHANNELS.get('ingest')
         else:
             node_name = _settings.celery_options.celery_nodes['update']
             queue_name = _settings.task_queue_options.QUEUE_CHANNELS.get('update')
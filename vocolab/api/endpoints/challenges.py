@@ -4,7 +4,7 @@ This section handles challenge data
 from typing import List
 
 from fastapi import (
-    APIRouter, Depends, UploadFile, File, BackgroundTasks
+    APIRouter, Depends, UploadFile, File
 )
 
 from vocolab import out, exc
@@ -60,7 +60,6 @@ async def upload_submission(
         challenge_id: int,
         submission_id: str,
         part_name: str,
-        background_tasks: BackgroundTasks,
         file_data: UploadFile = File(...),
         current_user: schema.User = Depends(api_lib.get_current_active_user),
 ):
@@ -69,11 +68,11 @@ async def upload_submission(
     if challenge is None:
         return ValueError(f'challenge {challenge_id} not found or inactive')
     try:
-        is_completed, remaining = submissions_lib.add_part(submission_id, part_name, file_data)
+        is_completed, remaining = await submissions_lib.add_part_async(submission_id, part_name, file_data)
 
         if is_completed:
-            # run the completion of the submission on the background
-            background_tasks.add_task(submissions_lib.complete_submission, submission_id, with_eval=True)
+            # completion of the submission is run by the ingest worker
+            submissions_lib.send_to_ingestion(submission_id, with_eval=True)
 
         return models.api.UploadSubmissionPartResponse(
             completed=is_completed, remaining=[n.file_name for n in remaining]
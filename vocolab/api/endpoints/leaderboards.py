@@ -1,16 +1,17 @@
 """ Routing for /leaderboards section of the API
 This section handles leaderboard data
 """
-from datetime import datetime
-from typing import List
+from datetime import datetime, date
+from typing import List, Optional
 
 from fastapi import (
-    APIRouter
+    APIRouter, Header, Query, Response, status
 )
+from fastapi.concurrency import run_in_threadpool
 from vocolab import exc
 from vocolab.db import models
 from vocolab.db.q import leaderboardQ
-from vocolab.lib import api_lib
+from vocolab.lib import api_lib, leaderboards_lib
 from vocolab.settings import get_settings
 
 router = APIRouter()
@@ -37,17 +38,64 @@ async def get_leaderboards_list():
 
 
 @router.get('/{leaderboard_id}/json',  responses={404: {"model": models.api.Message}})
-async def get_leaderboard_data(leaderboard_id: int):
+async def get_leaderboard_data(leaderboard_id: int, if_none_match: Optional[str] = Header(None),
+                               accept_encoding: Optional[str] = Header(None)):
     """ Return leaderboard of a specific challenge """
     try:
         leaderboard = await leaderboardQ.get_leaderboard(leaderboard_id=leaderboard_id)
     except ValueError:
         raise exc.ResourceRequestedNotFound(f'No leaderboard with id {leaderboard_id}')
 
-    if leaderboard.path_to.is_file():
-        return api_lib.file2dict(leaderboard.path_to)
-    else:
+    compiled = leaderboards_lib.get_compiled_leaderboard(leaderboard.path_to)
+    if compiled is None:
         return dict(
             updatedOn=datetime.now().isoformat(),
             data=[]
         )
+
+    # serve precompressed variant if accepted
+    encoding = api_lib.pick_encoding(accept_encoding, compiled.encoded.keys())
+    headers = {"ETag": compiled.etag_for(encoding), "Vary": "Accept-Encoding"}
+    if api_lib.etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if encoding is None:
+        return Response(content=compiled.content, media_type="application/json", headers=headers)
+
+    headers["Content-Encoding"] = encoding
+    return Response(content=compiled.encoded[encoding], media_type="application/json", headers=headers)
+
+
+@router.get('/{leaderboard_id}/entries', response_model=models.api.LeaderboardEntriesPage,
+            responses={404: {"model": models.api.Message}})
+async def get_leaderboard_entries(leaderboard_id: int, offset: int = Query(0, ge=0),
+                                  limit: int = Query(100, ge=1, le=1000), sort_by: Optional[str] = None,
+                                  fields: Optional[str] = None, author_label: Optional[str] = None,
+                                  date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """ Return a page of the entries of a leaderboard
+
+    - sort_by: comma separated dotted keys used to order entries (prefix with '-' for descending order)
+    - fields: comma separated list of dotted keys to include in each entry (ex: scores.abx.within)
+    - author_label, date_from, date_to: filter entries by author or submission date
+    """
+    try:
+        leaderboard = await leaderboardQ.get_leaderboard(leaderboard_id=leaderboard_id)
+    except ValueError:
+        raise exc.ResourceRequestedNotFound(f'No leaderboard with id {leaderboard_id}')
+
+    index = leaderboards_lib.get_leaderboard_index(leaderboard.path_to)
+    if index is None:
+        return models.api.LeaderboardEntriesPage(
+            leaderboard_id=leaderboard_id, updatedOn=None, total=0, offset=offset, limit=limit, entries=[]
+        )
+
+    # ranking by a new key is cpu bound, run it outside the event loop
+    total, entries = await run_in_threadpool(
+        index.query, offset=offset, limit=limit, sort_by=sort_by,
+        fields=[f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+        author_label=author_label, date_from=date_from, date_to=date_to
+    )
+    return models.api.LeaderboardEntriesPage(
+        leaderboard_id=leaderboard_id, updatedOn=index.updated_on, total=total, offset=offset, limit=limit,
+        entries=entries
+    )
@@ -53,43 +53,18 @@ def update_profile(
 @router.get('/submissions')
 async def submissions_list(current_user: schema.User = Depends(api_lib.get_current_active_user)):
     """ Return a list of all user submissions """
-    submissions = await challengesQ.get_user_submissions(user_id=current_user.id)
-    submissions = [
-        models.api.SubmissionPreview(
-            submission_id=s.id,
-            track_id=s.track_id,
-            track_label=(await challengesQ.get_challenge(challenge_id=s.track_id)).label,
-            status=s.status
-        )
-        for s in submissions
-    ]
-
-    data = {}
-    for sub in submissions:
-        if sub.track_label in data.keys():
-            data[sub.track_label].append(sub)
-        else:
-            data[sub.track_label] = [sub]
-
-    return data
+    return await challengesQ.get_user_submissions_by_track(user_id=current_user.id)
 
 
 @router.get('/submissions/tracks/{track_id}')
 async def submissions_list_by_track(
         track_id: int, current_user: schema.User = Depends(api_lib.get_current_active_user)):
     """ Return a list of all user submissions """
-    track = await challengesQ.get_challenge(challenge_id=track_id)
-    submissions = await challengesQ.get_user_submissions(user_id=current_user.id)
-
-    return [
-        models.api.SubmissionPreview(
-            submission_id=s.id,
-            track_id=s.track_id,
-            track_label=track.label,
-            status=s.status
-        )
-        for s in submissions if s.track_id == track.id
-    ]
+    submissions = await challengesQ.get_user_submission_previews(user_id=current_user.id, by_track=track_id)
+    if not submissions:
+        # raises if the track does not exist
+        await challengesQ.get_challenge(challenge_id=track_id, allow_inactive=True)
+    return submissions
 
 
 @router.get('/submissions/{submissions_id}')
@@ -157,13 +132,9 @@ async def get_user_results(submissions_id: str, current_user: schema.User = Depe
     if submission.user_id != current_user.id:
         raise exc.AccessError("current user is not allowed to preview this submission !",
                               status=exc.http_status.HTTP_403_FORBIDDEN)
-    sub_location = submissions_lib.get_submission_dir(submission_id=submission.id)
-
     leaderboards = await leaderboardQ.get_leaderboards(by_challenge_id=submission.track_id)
-    result = {}
-    for ld in leaderboards:
-        ld_file = sub_location / ld.entry_file
-        if ld_file.is_file():
-            result[ld.label] = api_lib.file2dict(ld_file)
-
-    return result
+    scores = submissions_lib.load_scores_bundle(submission.id, [ld.entry_file for ld in leaderboards])
+    return {
+        ld.label: scores[ld.entry_file]
+        for ld in leaderboards if ld.entry_file in scores
+    }
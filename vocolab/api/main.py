@@ -7,13 +7,13 @@ import traceback
 from fastapi import FastAPI, Request, status
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from vocolab import settings, out
 from vocolab.api import router as v1_router
 from vocolab.db import zrDB, create_db
 from vocolab.exc import VocoLabException
+from vocolab.lib import api_lib, misc
 
 _settings = settings.get_settings()
 
@@ -27,7 +27,8 @@ app = FastAPI(
     description=f"{_settings.documentation_options.doc_description}",
     version=f"{_settings.app_options.version}",
     swagger_static={"favicon": _settings.api_options.favicon},
-    middleware=middleware
+    middleware=middleware,
+    default_response_class=ORJSONResponse if misc.HAS_ORJSON else JSONResponse
 )
 
 # app.add_middleware(
@@ -117,4 +118,4 @@ async def shutdown():
 
 # sub applications
 app.include_router(v1_router.api_router)
-app.mount("/static", StaticFiles(directory=str(_settings.static_files_directory)), name="static")
+app.mount("/static", api_lib.PublicStaticFiles(directory=str(_settings.static_files_directory)), name="static")
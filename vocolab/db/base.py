@@ -1,22 +1,58 @@
-import databases
+from functools import lru_cache
+
 import sqlalchemy
 
+from vocolab.db import schema
 from vocolab.db.schema import users_metadata, challenge_metadata
+from vocolab.db.sqlite import Database, connection_factory
 from vocolab.settings import get_settings
 
 _settings = get_settings()
 
 _USERS_CONN = f"sqlite:///{_settings.DATA_FOLDER}/{_settings.database_options.db_file}"
+_ConnectionFactory = connection_factory(_settings.database_options.sqlite_pragmas())
+
+zrDB = Database(
+    _USERS_CONN,
+    factory=_ConnectionFactory,
+    check_same_thread=False,
+    pool_size=_settings.database_options.pool_size
+)
 
-zrDB = databases.Database(_USERS_CONN)
+
+@lru_cache()
+def get_engine() -> sqlalchemy.engine.Engine:
+    """ Synchronous engine on the database (created once per process) """
+    return sqlalchemy.create_engine(
+        _USERS_CONN, connect_args={"check_same_thread": False, "factory": _ConnectionFactory}
+    )
 
 
 def create_db():
     if not (_settings.DATA_FOLDER / _settings.database_options.db_file).is_file():
         (_settings.DATA_FOLDER / _settings.database_options.db_file).touch()
 
-    engine = sqlalchemy.create_engine(
-       _USERS_CONN, connect_args={"check_same_thread": False}
-    )
+    engine = get_engine()
+    _migrate_leaderboard_entries(engine)
     users_metadata.create_all(engine)
     challenge_metadata.create_all(engine)
+    _create_missing_indexes(engine)
+
+
+def _migrate_leaderboard_entries(engine):
+    """ Drop the legacy leaderboard_entries table (never populated) to allow its re-creation with the new layout """
+    inspector = sqlalchemy.inspect(engine)
+    if not inspector.has_table(schema.leaderboard_entry_table.name):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns(schema.leaderboard_entry_table.name)}
+    if 'data' not in columns:
+        schema.leaderboard_entry_table.drop(engine)
+
+
+def _create_missing_indexes(engine):
+    """ Create indexes declared in the schema that are missing from an existing database """
+    for metadata in (users_metadata, challenge_metadata):
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
@@ -1,3 +1,5 @@
+from typing import List, Dict, Any, Optional
+
 from pydantic import BaseModel
 
 
@@ -8,3 +10,13 @@ class LeaderboardPublicView(BaseModel):
     entry_file: str
     archived: bool
     static_files: bool
+
+
+class LeaderboardEntriesPage(BaseModel):
+    """ A page of leaderboard entries """
+    leaderboard_id: int
+    updatedOn: Optional[str]
+    total: int
+    offset: int
+    limit: int
+    entries: List[Dict[str, Any]]
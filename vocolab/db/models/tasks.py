@@ -14,6 +14,7 @@ from vocolab import out
 class QueuesNames(str, Enum):
     eval_queue = "eval_queue"
     update_queue = "update_queue"
+    ingest_queue = "ingest_queue"
 
 
 class BrokerMessage(BaseModel):
@@ -60,6 +61,18 @@ class SubmissionEvaluationMessage(BrokerMessage):
                f"{self.executor} {self.bin_path}/{self.script_name} {self.cmd_args} --"
 
 
+class SubmissionIngestMessage(BrokerMessage):
+    """ A Broker Message that requests the ingestion of an uploaded submission (merge, extract, evaluate) """
+    submission_id: str
+    with_eval: bool = True
+
+    def __repr__(self):
+        """ Stringify the message for logging"""
+        return f"{self.job_id} >> " \
+               f"{self.submission_id}@{self.label}:: " \
+               f"ingest(with_eval={self.with_eval})--"
+
+
 class UpdateType(str, Enum):
     evaluation_complete = "evaluation_complete"
     evaluation_failed = "evaluation_failed"
@@ -90,7 +103,7 @@ class SimpleLogMessage(BrokerMessage):
 
 
 def message_from_bytes(byte_msg: bytes) -> Union[BrokerMessage,
-                                                 SubmissionEvaluationMessage,
+                                                 SubmissionEvaluationMessage, SubmissionIngestMessage,
                                                  SubmissionUpdateMessage, SimpleLogMessage]:
     """ Convert a bytes object to the correct corresponding Message object """
 
@@ -109,6 +122,8 @@ def message_from_bytes(byte_msg: bytes) -> Union[BrokerMessage,
             return SubmissionEvaluationMessage(**url_obj)
         elif message_type == "SubmissionUpdateMessage":
             return SubmissionUpdateMessage(**url_obj)
+        elif message_type == "SubmissionIngestMessage":
+            return SubmissionIngestMessage(**url_obj)
         elif message_type == "SimpleLogMessage":
             return SimpleLogMessage(**url_obj)
         elif message_type == "BrokerMessage":
@@ -0,0 +1,108 @@
+"""
+In-process caches for rarely changing metadata (challenges, evaluators, leaderboards) & users
+"""
+import time
+from typing import Any, Hashable, Optional
+
+import sqlalchemy
+from sqlalchemy.dialects.sqlite import insert
+
+from vocolab import get_settings
+from vocolab.db import schema, zrDB
+from vocolab.lib import misc
+
+_settings = get_settings()
+
+MISSING = object()
+_versions_table_created = False
+
+
+async def _ensure_versions_table():
+    """ Create the version table if needed (databases created by an older version, before create_db was re-run) """
+    global _versions_table_created
+    if not _versions_table_created:
+        await zrDB.execute(sqlalchemy.schema.CreateTable(schema.cache_versions_table, if_not_exists=True))
+        _versions_table_created = True
+
+
+class MetadataCache:
+    """ TTL cache invalidated through a version counter stored in the database
+
+    Writes bump the counter of the cache (see invalidate), other processes notice the
+    change the next time they check the counter and drop their cached items.
+
+    :param name: name of the version counter
+    :param ttl: lifetime of items in seconds
+    :param check_interval: minimum delay (in seconds) between two checks of the version counter
+    :param max_size: maximum number of cached items
+    """
+
+    def __init__(self, name: str, ttl: float, check_interval: float, max_size: int = 1024):
+        self.name = name
+        self.check_interval = check_interval
+        self._items = misc.TTLCache(ttl=ttl, max_size=max_size)
+        self._version: Optional[int] = None
+        self._checked_at: float = 0
+
+    async def get(self, key: Hashable) -> Any:
+        """ Fetch an item from the cache (MISSING if not present) """
+        await self._sync()
+        return self._items.get(key, MISSING)
+
+    def set(self, key: Hashable, value: Any):
+        """ Add an item to the cache """
+        if self._version is not None:
+            self._items.set(key, value)
+
+    async def invalidate(self):
+        """ Drop all cached items in this process and bump the version counter for the others """
+        await _ensure_versions_table()
+        table = schema.cache_versions_table
+        query = insert(table).values(name=self.name, version=1).on_conflict_do_update(
+            index_elements=[table.c.name], set_=dict(version=table.c.version + 1)
+        )
+        await zrDB.execute(query)
+        self.clear()
+
+    def clear(self):
+        """ Drop all cached items (in this process only) """
+        self._items.clear()
+        self._version = None
+        self._checked_at = 0
+
+    async def _sync(self):
+        """ Drop cached items if the version counter changed since the last check """
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.check_interval:
+            return
+
+        await _ensure_versions_table()
+        table = schema.cache_versions_table
+        version = await zrDB.fetch_val(
+            sqlalchemy.select(table.c.version).where(table.c.name == self.name)
+        )
+        version = version or 0
+        if version != self._version:
+            self._items.clear()
+        self._version = version
+        self._checked_at = now
+
+
+def _metadata_cache(name: str) -> MetadataCache:
+    options = _settings.database_options
+    return MetadataCache(
+        name, ttl=options.metadata_cache_ttl.total_seconds(),
+        check_interval=options.metadata_cache_check.total_seconds()
+    )
+
+
+challenges_cache = _metadata_cache('challenges')
+evaluators_cache = _metadata_cache('evaluators')
+leaderboards_cache = _metadata_cache('leaderboards')
+
+# users are used to validate sessions: the version counter is checked on every hit (by default)
+# so that disabled users or changed passwords are seen by all processes
+users_cache = MetadataCache(
+    'users', ttl=_settings.user_options.cache_ttl.total_seconds(),
+    check_interval=_settings.user_options.cache_check.total_seconds(), max_size=4096
+)
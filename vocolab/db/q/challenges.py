@@ -1,9 +1,13 @@
-from datetime import datetime
-from typing import List, Any, Optional
+import itertools
+from datetime import datetime, date
+from typing import List, Any, Optional, Dict, FrozenSet
 from uuid import uuid4
 
+import sqlalchemy
+
 from vocolab import get_settings
 from vocolab.db import models, zrDB, schema, exc as db_exc
+from vocolab.db.q.cache import MISSING, challenges_cache, evaluators_cache
 from vocolab.lib import misc
 
 _settings = get_settings()
@@ -18,6 +22,17 @@ async def create_new_challenge(item: models.cli.NewChallenge):
         await zrDB.execute(query)
     except Exception as e:
         db_exc.parse_user_insertion(e)
+    await challenges_cache.invalidate()
+
+
+def _active_clause(present: date):
+    """ SQL condition matching the challenges active at the given date (see Challenge.is_active) """
+    table = schema.challenges_table
+    return sqlalchemy.and_(
+        table.c.active == True,  # noqa: sqlalchemy operator
+        table.c.start_date <= present,
+        sqlalchemy.or_(table.c.end_date == None, table.c.end_date >= present)  # noqa: sqlalchemy operator
+    )
 
 
 async def list_challenges(*, include_all: bool = False) -> List[schema.Challenge]:
@@ -25,16 +40,34 @@ async def list_challenges(*, include_all: bool = False) -> List[schema.Challenge
 
     flag include_all allows to filter out inactive challenges
     """
-    query = schema.challenges_table.select()
-    challenges = await zrDB.fetch_all(query)
-    if challenges is None:
-        raise ValueError('No challenges were found')
-
-    challenges = [schema.Challenge(**c) for c in challenges]
-    if include_all:
-        return challenges
-    else:
-        return [c for c in challenges if c.is_active()]
+    present = date.today()
+    key = 'all' if include_all else ('active', present)
+    challenges = await challenges_cache.get(key)
+    if challenges is MISSING:
+        query = schema.challenges_table.select()
+        if not include_all:
+            query = query.where(_active_clause(present))
+
+        challenges = await zrDB.fetch_all(query)
+        if challenges is None:
+            raise ValueError('No challenges were found')
+
+        challenges = [schema.Challenge(**c) for c in challenges]
+        challenges_cache.set(key, challenges)
+
+    return [ch.copy() for ch in challenges]
+
+
+async def get_active_challenge_ids() -> FrozenSet[int]:
+    """ Returns the ids of the currently active challenges """
+    present = date.today()
+    key = ('active_ids', present)
+    active_ids = await challenges_cache.get(key)
+    if active_ids is MISSING:
+        query = sqlalchemy.select(schema.challenges_table.c.id).where(_active_clause(present))
+        active_ids = frozenset(r['id'] for r in await zrDB.fetch_all(query))
+        challenges_cache.set(key, active_ids)
+    return active_ids
 
 
 async def get_challenge(*,
@@ -45,17 +78,23 @@ async def get_challenge(*,
     :note:  in strict mode (allow_inactive = False) the function raises a ValueError
     if the challenge has expired or is inactive.
     """
-    query = schema.challenges_table.select().where(
-        schema.challenges_table.c.id == challenge_id
-    )
-    ch = await zrDB.fetch_one(query)
-    if ch is None:
-        raise ValueError(f'There is no challenge with the following id: {challenge_id}')
-    ch = schema.Challenge(**ch)
+    ch = await challenges_cache.get(challenge_id)
+    if ch is MISSING:
+        query = schema.challenges_table.select().where(
+            schema.challenges_table.c.id == challenge_id
+        )
+        ch = await zrDB.fetch_one(query)
+        if ch is None:
+            raise ValueError(f'There is no challenge with the following id: {challenge_id}')
+        ch = schema.Challenge(**ch)
+        challenges_cache.set(challenge_id, ch)
+
+    # cached objects are shared, callers get their own copy
+    ch = ch.copy()
     if allow_inactive:
         return ch
     else:
-        if not ch.is_active():
+        if ch.id not in await get_active_challenge_ids():
             raise ValueError(f"The Challenge {ch.label}[{ch.id}] is not active")
         return ch
 
@@ -81,6 +120,7 @@ async def update_challenge_property(*, challenge_id: int, variable_name: str, va
         await zrDB.execute(query)
     except Exception as e:
         db_exc.parse_user_insertion(e)
+    await challenges_cache.invalidate()
 
     return value
 
@@ -90,7 +130,9 @@ async def delete_challenge(*, ch_id: int):
     query = schema.challenges_table.delete().where(
         schema.challenges_table.c.id == ch_id
     )
-    return await zrDB.execute(query)
+    result = await zrDB.execute(query)
+    await challenges_cache.invalidate()
+    return result
 
 
 async def add_submission(*, new_submission: models.api.NewSubmission, evaluator_id: int):
@@ -157,6 +199,43 @@ async def get_user_submissions(*, user_id: int) -> List[schema.ChallengeSubmissi
     return [schema.ChallengeSubmission(**it) for it in subs]
 
 
+async def get_user_submission_previews(*, user_id: int, by_track: Optional[int] = None
+                                       ) -> List[models.api.SubmissionPreview]:
+    """ Fetch the submissions of a user along with the label of their track (single joined query)
+
+    :param user_id: id of the owner of the submissions
+    :param by_track: only return submissions made to this track
+    """
+    submissions = schema.submissions_table
+    challenges = schema.challenges_table
+    query = sqlalchemy.select(
+        submissions.c.id.label('submission_id'),
+        submissions.c.track_id,
+        challenges.c.label.label('track_label'),
+        submissions.c.status,
+    ).select_from(
+        submissions.join(challenges, submissions.c.track_id == challenges.c.id)
+    ).where(
+        submissions.c.user_id == user_id
+    ).order_by(challenges.c.label, submissions.c.submit_date)
+
+    if by_track is not None:
+        query = query.where(submissions.c.track_id == by_track)
+
+    subs = await zrDB.fetch_all(query)
+    return [models.api.SubmissionPreview(**it) for it in subs]
+
+
+async def get_user_submissions_by_track(*, user_id: int) -> Dict[str, List[models.api.SubmissionPreview]]:
+    """ Fetch the submissions of a user grouped by track label """
+    previews = await get_user_submission_previews(user_id=user_id)
+    # rows are ordered by track label, so each group is contiguous
+    return {
+        label: list(group)
+        for label, group in itertools.groupby(previews, key=lambda p: p.track_label)
+    }
+
+
 async def update_submission_status(*, by_id: str, status: schema.SubmissionStatus):
     """ Update the status of a submission """
     query = schema.submissions_table.update().where(
@@ -239,13 +318,19 @@ async def get_evaluators():
 async def get_evaluator(*, by_id: int) -> Optional[schema.EvaluatorItem]:
     """ Returns a specific evaluator """
 
+    evaluator = await evaluators_cache.get(by_id)
+    if evaluator is not MISSING:
+        return evaluator.copy()
+
     query = schema.evaluators_table.select().where(
         schema.evaluators_table.c.id == by_id
     )
     result = await zrDB.fetch_one(query)
     if not result:
         return None
-    return schema.EvaluatorItem(**result)
+    evaluator = schema.EvaluatorItem(**result)
+    evaluators_cache.set(by_id, evaluator)
+    return evaluator.copy()
 
 
 async def add_evaluator(*, lst_eval: List[models.cli.NewEvaluatorItem]):
@@ -265,6 +350,7 @@ async def add_evaluator(*, lst_eval: List[models.cli.NewEvaluatorItem]):
                 schema.evaluators_table.c.id == res.id
             ).values(executor=i.executor, script_path=i.script_path, executor_arguments=i.executor_arguments)
             await zrDB.execute(update_query)
+    await evaluators_cache.invalidate()
 
 
 async def edit_evaluator_args(*, eval_id: int, arg_list: List[str]):
@@ -273,3 +359,4 @@ async def edit_evaluator_args(*, eval_id: int, arg_list: List[str]):
         schema.evaluators_table.c.id == eval_id
     ).values(executor_arguments=";".join(arg_list))
     await zrDB.execute(query)
+    await evaluators_cache.invalidate()
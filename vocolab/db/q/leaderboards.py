@@ -3,7 +3,11 @@ Database functions that manipulate the leaderboard table
 """
 from pathlib import Path
 from typing import Any, List, Optional
+
+import sqlalchemy
+
 from vocolab.db import schema, zrDB, exc as db_exc
+from vocolab.db.q.cache import MISSING, leaderboards_cache
 from vocolab.lib import misc
 
 
@@ -13,6 +17,11 @@ async def get_leaderboard(*, leaderboard_id: int) -> schema.LeaderBoard:
     :raise ValueError if the item is not is the database
     :raise SQLAlchemy exceptions if database connection or condition fails
     """
+    ld = await leaderboards_cache.get(leaderboard_id)
+    if ld is not MISSING:
+        # cached objects are shared, callers get their own copy
+        return ld.copy()
+
     query = schema.leaderboards_table.select().where(
         schema.leaderboards_table.c.id == leaderboard_id
     )
@@ -20,7 +29,9 @@ async def get_leaderboard(*, leaderboard_id: int) -> schema.LeaderBoard:
     if ld is None:
         raise ValueError(f'Leaderboard: {leaderboard_id} not found in database !!!')
 
-    return schema.LeaderBoard(**ld)
+    ld = schema.LeaderBoard(**ld)
+    leaderboards_cache.set(leaderboard_id, ld)
+    return ld.copy()
 
 
 async def get_leaderboards(*, by_challenge_id: Optional[int] = None) -> List[schema.LeaderBoard]:
@@ -37,8 +48,12 @@ async def get_leaderboards(*, by_challenge_id: Optional[int] = None) -> List[sch
     else:
         raise ValueError("No parameter given")
 
-    lst_ld = await zrDB.fetch_all(query)
-    return [schema.LeaderBoard(**ld) for ld in lst_ld]
+    key = ('challenge', by_challenge_id)
+    lst_ld = await leaderboards_cache.get(key)
+    if lst_ld is MISSING:
+        lst_ld = [schema.LeaderBoard(**ld) for ld in await zrDB.fetch_all(query)]
+        leaderboards_cache.set(key, lst_ld)
+    return [ld.copy() for ld in lst_ld]
 
 
 async def list_leaderboards() -> List[schema.LeaderBoard]:
@@ -71,9 +86,11 @@ async def create_leaderboard(*, lead_data: schema.LeaderBoard) -> int:
     )
     try:
         result = await zrDB.execute(query)
-        return result
     except Exception as e:
         db_exc.parse_user_insertion(e)
+    else:
+        await leaderboards_cache.invalidate()
+        return result
 
 
 async def update_leaderboard_value(*, leaderboard_id, variable_name: str, value: Any, allow_parsing: bool = False):
@@ -106,5 +123,75 @@ async def update_leaderboard_value(*, leaderboard_id, variable_name: str, value:
         await zrDB.execute(query)
     except Exception as e:
         db_exc.parse_user_insertion(e)
+    await leaderboards_cache.invalidate()
 
     return value
+
+
+async def set_leaderboard_entry(*, entry: schema.LeaderboardEntry):
+    """ Store an entry into the leaderboard entry index (replaces previous entry of the same submission) """
+    table = schema.leaderboard_entry_table
+    async with zrDB.transaction():
+        await zrDB.execute(table.delete().where(
+            (table.c.submission_id == entry.submission_id) & (table.c.leaderboard_id == entry.leaderboard_id)
+        ))
+        await zrDB.execute(table.insert().values(
+            entry_path=f"{entry.entry_path}",
+            model_id=entry.model_id,
+            submission_id=entry.submission_id,
+            leaderboard_id=entry.leaderboard_id,
+            user_id=entry.user_id,
+            data=entry.data,
+            submitted_at=entry.submitted_at
+        ))
+
+
+async def get_leaderboard_entries(*, leaderboard_id: Optional[int] = None,
+                                  by_challenge_id: Optional[int] = None) -> List[schema.LeaderboardEntry]:
+    """ Fetch the indexed entries of all the completed submissions of a leaderboard
+
+    :param leaderboard_id: fetch entries of the given leaderboard
+    :param by_challenge_id: fetch entries of all the leaderboards of a challenge
+    :raise ValueError if no parameter was given
+    :raise SQLAlchemy exceptions if database connection or condition fails
+    """
+    entries = schema.leaderboard_entry_table
+    submissions = schema.submissions_table
+    leaderboards = schema.leaderboards_table
+    if leaderboard_id is not None:
+        condition = entries.c.leaderboard_id == leaderboard_id
+    elif by_challenge_id is not None:
+        condition = entries.c.leaderboard_id.in_(
+            sqlalchemy.select(leaderboards.c.id).where(leaderboards.c.challenge_id == by_challenge_id)
+        )
+    else:
+        raise ValueError("No parameter given")
+
+    query = sqlalchemy.select(entries, submissions.c.author_label).select_from(
+        entries.join(submissions, entries.c.submission_id == submissions.c.id)
+    ).where(
+        condition & (submissions.c.status == schema.SubmissionStatus.completed.value)
+    ).order_by(entries.c.submitted_at)
+
+    results = await zrDB.fetch_all(query)
+    return [schema.LeaderboardEntry(**r) for r in results]
+
+
+async def list_unindexed_submissions(*, leaderboard_id: int, challenge_id: int) -> List[schema.ChallengeSubmission]:
+    """ Fetch the completed submissions of a challenge that have no entry indexed for the given leaderboard
+
+    :raise SQLAlchemy exceptions if database connection or condition fails
+    """
+    entries = schema.leaderboard_entry_table
+    submissions = schema.submissions_table
+    query = submissions.select().select_from(
+        submissions.outerjoin(entries, (entries.c.submission_id == submissions.c.id)
+                              & (entries.c.leaderboard_id == leaderboard_id))
+    ).where(
+        (submissions.c.track_id == challenge_id)
+        & (submissions.c.status == schema.SubmissionStatus.completed.value)
+        & (entries.c.id.is_(None))
+    )
+
+    results = await zrDB.fetch_all(query)
+    return [schema.ChallengeSubmission(**r) for r in results]
@@ -7,6 +7,7 @@ from email_validator import validate_email, EmailNotValidError
 
 from vocolab import exc, out
 from vocolab.db import zrDB, models, schema, exc as db_exc
+from vocolab.db.q.cache import MISSING, users_cache
 from vocolab.lib import users_lib
 from vocolab.settings import get_settings
 
@@ -16,7 +17,7 @@ _settings = get_settings()
 async def create_user(*, usr: models.misc.UserCreate):
     """ Create a new user entry in the users' database."""
 
-    hashed_pswd, salt = users_lib.hash_pwd(password=usr.pwd)
+    hashed_pswd, salt = await users_lib.hash_pwd_async(password=usr.pwd)
     verification_code = secrets.token_urlsafe(8)
     try:
         # insert user entry into the database
@@ -60,6 +61,7 @@ async def verify_user(*, username: str, verification_code: str):
             verified='True'
         )
         await zrDB.execute(query)
+        await users_cache.invalidate()
         return True
     elif secrets.compare_digest(user.verified, 'True'):
         raise exc.ActionNotValid("Email already verified")
@@ -81,6 +83,7 @@ async def admin_verification(*, user_id: int):
         verified='True'
     )
     res = await zrDB.execute(query)
+    await users_cache.invalidate()
 
     if res == 0:
         raise ValueError(f'user {user_id} was not found')
@@ -88,8 +91,7 @@ async def admin_verification(*, user_id: int):
 
 def check_users_password(*, password: str, user: schema.User):
     """ Verify that a given password matches the users """
-    hashed_pwd, _ = users_lib.hash_pwd(password=password, salt=user.salt)
-    return hashed_pwd == user.hashed_pswd
+    return users_lib.check_pwd(password=password, hashed_pswd=user.hashed_pswd, salt=user.salt)
 
 
 async def get_user_for_login(login_id: str, password: str) -> Optional[schema.User]:
@@ -113,10 +115,20 @@ async def get_user_for_login(login_id: str, password: str) -> Optional[schema.Us
     user = schema.User(**user)
     out.console.print(f"===> {user=}")
 
-    hashed_pswd, _ = users_lib.hash_pwd(password=password, salt=user.salt)
-    if user.enabled and hashed_pswd == user.hashed_pswd:
-        return user
-    return None
+    valid = await users_lib.check_pwd_async(password=password, hashed_pswd=user.hashed_pswd, salt=user.salt)
+    if not (user.enabled and valid):
+        return None
+
+    # upgrade hashes created with different parameters
+    if users_lib.needs_rehash(user.hashed_pswd):
+        hashed_pswd, salt = await users_lib.hash_pwd_async(password=password)
+        query = schema.users_table.update().where(
+            schema.users_table.c.id == user.id
+        ).values(hashed_pswd=hashed_pswd, salt=salt)
+        await zrDB.execute(query)
+        await users_cache.invalidate()
+        user = user.copy(update=dict(hashed_pswd=hashed_pswd, salt=salt))
+    return user
 
 
 async def get_user(*, by_uid: Optional[int] = None, by_username: Optional[str] = None,
@@ -150,6 +162,19 @@ async def get_user(*, by_uid: Optional[int] = None, by_username: Optional[str] =
     return schema.User(**user)
 
 
+async def get_cached_user(*, by_email: str) -> schema.User:
+    """ Get a user by email using an in-process cache (items expire after user_options.cache_ttl)
+
+    :raises ValueError if the user does not exist
+    """
+    user = await users_cache.get(by_email)
+    if user is MISSING:
+        user = await get_user(by_email=by_email)
+        users_cache.set(by_email, user)
+    # cached objects are shared, callers get their own copy
+    return user.copy()
+
+
 async def get_user_list() -> List[schema.User]:
     """ Return a list of all users """
     query = schema.users_table.select()
@@ -165,7 +190,9 @@ async def delete_user(*, uid: int):
         schema.users_table.c.id == uid
     )
     # returns number of deleted entries
-    return await zrDB.execute(query)
+    res = await zrDB.execute(query)
+    await users_cache.invalidate()
+    return res
 
 
 async def update_users_password(*, user: schema.User, password: str, password_validation: str):
@@ -174,12 +201,13 @@ async def update_users_password(*, user: schema.User, password: str, password_va
     if password != password_validation:
         raise ValueError('passwords do not match')
 
-    hashed_pswd, salt = users_lib.hash_pwd(password=password)
+    hashed_pswd, salt = await users_lib.hash_pwd_async(password=password)
     query = schema.users_table.update().where(
         schema.users_table.c.id == user.id
     ).values(hashed_pswd=hashed_pswd, salt=salt)
 
     await zrDB.execute(query)
+    await users_cache.invalidate()
 
 
 async def toggle_user_status(*, user_id: int, active: bool = True):
@@ -190,6 +218,7 @@ async def toggle_user_status(*, user_id: int, active: bool = True):
         active=active
     )
     res = await zrDB.execute(query)
+    await users_cache.invalidate()
 
     if res == 0:
         raise ValueError(f'user {user_id} was not found')
@@ -200,4 +229,6 @@ async def toggle_all_users_status(*, active: bool = True):
     query = schema.users_table.update().values(
         active=active
     )
-    return await zrDB.execute(query)
+    res = await zrDB.execute(query)
+    await users_cache.invalidate()
+    return res
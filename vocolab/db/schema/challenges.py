@@ -1,6 +1,6 @@
 from datetime import datetime, date
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict, Any
 
 import sqlalchemy
 from pydantic import BaseModel, HttpUrl
@@ -127,7 +127,7 @@ class LeaderBoard(BaseModel):
     archived: bool  # is_archived
     external_entries: Optional[Path]  # Location of external entries (baselines, toplines, archived)
     static_files: bool  # has static files
-    sorting_key: Optional[str]  # path to the item to use as sorting key
+    sorting_key: Optional[str]  # path(s) to the items to use as sorting keys (comma separated, '-' for desc)
 
     @classmethod
     def get_field_names(cls):
@@ -152,6 +152,7 @@ leaderboards_table = sqlalchemy.Table(
     sqlalchemy.Column('external_entries', sqlalchemy.String),
     sqlalchemy.Column('static_files', sqlalchemy.Boolean),
     sqlalchemy.Column('sorting_key', sqlalchemy.String),
+    sqlalchemy.Index('ix_leaderboards_challenge_id', 'challenge_id'),
 )
 
 
@@ -206,28 +207,50 @@ submissions_table = sqlalchemy.Table(
     sqlalchemy.Column("status", sqlalchemy.String),
     sqlalchemy.Column("auto_eval", sqlalchemy.Boolean),
     sqlalchemy.Column("evaluator_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("evaluators.id")),
-    sqlalchemy.Column("author_label", sqlalchemy.String)
+    sqlalchemy.Column("author_label", sqlalchemy.String),
+    sqlalchemy.Index("ix_challenge_submissions_track_status", "track_id", "status"),
+    sqlalchemy.Index("ix_challenge_submissions_user_date", "user_id", "submit_date"),
+    sqlalchemy.Index("ix_challenge_submissions_status", "status"),
 )
 
 
-class LeaderboardEntry:
+class LeaderboardEntry(BaseModel):
     """ Data representation of a leaderboard entry """
     id: Optional[int]
-    entry_path: Path
-    model_id: str
+    entry_path: Path  # location of the entry file in the submission
+    model_id: Optional[str]
     submission_id: str
     leaderboard_id: int
+    user_id: int
+    data: Dict[str, Any]  # parsed entry (empty if the submission has no entry for the leaderboard)
     submitted_at: datetime
+    author_label: Optional[str] = None  # author_label of the submission (not stored in the table)
+
+    class Config:
+        orm_mode = True
 
 
-""" Table indexing all leaderboard entries and their location  (as stores json files)"""
+""" Table indexing all leaderboard entries (parsed from the json files stored in submissions) """
 leaderboard_entry_table = sqlalchemy.Table(
     "leaderboard_entries",
     challenge_metadata,
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True, unique=True, autoincrement=True),
     sqlalchemy.Column("entry_path", sqlalchemy.String),
-    sqlalchemy.Column("model_id", sqlalchemy.String, sqlalchemy.ForeignKey("leaderboards.id")),
+    sqlalchemy.Column("model_id", sqlalchemy.String, sqlalchemy.ForeignKey("models.id")),
     sqlalchemy.Column("submission_id", sqlalchemy.String, sqlalchemy.ForeignKey("challenge_submissions.id")),
-    sqlalchemy.Column("leaderboard_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("models.id")),
-    sqlalchemy.Column("submitted_at", sqlalchemy.String)
+    sqlalchemy.Column("leaderboard_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("leaderboards.id")),
+    sqlalchemy.Column("user_id", sqlalchemy.Integer),
+    sqlalchemy.Column("data", sqlalchemy.JSON),
+    sqlalchemy.Column("submitted_at", sqlalchemy.DateTime),
+    sqlalchemy.UniqueConstraint("submission_id", "leaderboard_id"),
+    sqlalchemy.Index("ix_leaderboard_entries_leaderboard_date", "leaderboard_id", "submitted_at"),
+)
+
+
+""" Table keeping a version counter per group of cached metadata (used to invalidate caches across processes) """
+cache_versions_table = sqlalchemy.Table(
+    "cache_versions",
+    challenge_metadata,
+    sqlalchemy.Column("name", sqlalchemy.String, primary_key=True),
+    sqlalchemy.Column("version", sqlalchemy.Integer, nullable=False, default=0),
 )
@@ -0,0 +1,75 @@
+""" SQLite connection tuning & pooling for the databases package """
+import sqlite3
+import typing
+
+import aiosqlite
+import databases
+from databases.backends.sqlite import SQLiteBackend, SQLitePool
+from databases.core import DatabaseURL
+
+
+def connection_factory(pragmas: typing.List[str]) -> typing.Type[sqlite3.Connection]:
+    """ Build a sqlite3 Connection class that applies the given PRAGMAs when connecting """
+
+    class TunedConnection(sqlite3.Connection):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            for pragma in pragmas:
+                self.execute(f"PRAGMA {pragma}")
+
+    return TunedConnection
+
+
+class PooledSQLitePool(SQLitePool):
+    """ SQLite pool that keeps idle connections open for re-use
+
+    The default pool opens (and closes) a connection & its thread for every acquire.
+    Connections are only kept while the database is connected, idle connection threads
+    would otherwise prevent the interpreter from exiting.
+    """
+
+    def __init__(self, url: DatabaseURL, pool_size: int = 0, **options: typing.Any):
+        super().__init__(url, **options)
+        self._pool_size = pool_size
+        self._idle: typing.List[aiosqlite.Connection] = []
+        self.enabled = False
+
+    async def acquire(self) -> aiosqlite.Connection:
+        if self._idle:
+            return self._idle.pop()
+        return await super().acquire()
+
+    async def release(self, connection: aiosqlite.Connection) -> None:
+        if self.enabled and len(self._idle) < self._pool_size and not connection.in_transaction:
+            self._idle.append(connection)
+        else:
+            await super().release(connection)
+
+    async def close(self) -> None:
+        """ Close all idle connections """
+        self.enabled = False
+        while self._idle:
+            await super().release(self._idle.pop())
+
+
+class PooledSQLiteBackend(SQLiteBackend):
+    """ SQLite backend using a pool of re-usable connections """
+
+    def __init__(self, database_url: typing.Union[DatabaseURL, str], **options: typing.Any):
+        pool_size = options.pop('pool_size', 0)
+        super().__init__(database_url, **options)
+        self._pool = PooledSQLitePool(self._database_url, pool_size, **self._options)
+
+    async def connect(self) -> None:
+        self._pool.enabled = True
+
+    async def disconnect(self) -> None:
+        await self._pool.close()
+
+
+class Database(databases.Database):
+    """ databases.Database using the pooled backend for sqlite urls """
+    SUPPORTED_BACKENDS = {
+        **databases.Database.SUPPORTED_BACKENDS,
+        'sqlite': 'vocolab.db.sqlite:PooledSQLiteBackend'
+    }
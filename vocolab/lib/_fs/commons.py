@@ -1,25 +1,35 @@
-import json
+import asyncio
 import shlex
 import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from shutil import which
-from typing import Union, Dict, List, Optional, Tuple
-from zipfile import ZipFile
+from typing import Union, Dict, List, Optional, Tuple, BinaryIO, Callable
+from zipfile import ZipFile, ZipInfo
 
 import yaml
 from Crypto.Hash import MD5
 
+try:
+    # use libyaml bindings when available
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 from vocolab import out
+from vocolab.lib import misc
 
 
 def load_dict_file(location: Path) -> Union[Dict, List]:
     """ Load a dict type file (json, yaml, toml)"""
+    if location.suffix == '.json':
+        return misc.read_json(location)
+
     with location.open() as fp:
-        if location.suffix == '.json':
-            return json.load(fp)
-        elif location.suffix in ('.yaml', 'yml'):
-            return yaml.load(fp, Loader=yaml.FullLoader)
+        if location.suffix in ('.yaml', '.yml'):
+            return yaml.load(fp, Loader=YamlLoader)
         else:
             raise ValueError('Not a known file type !!!')
 
@@ -88,13 +98,131 @@ def md5sum(file_path: Path, chunk_size: int = 8192):
     return h.hexdigest()
 
 
-def unzip(archive: Path, output: Path):
-    """ Unzips contents of a zip archive into the output directory """
+class HashedWriter:
+    """ Binary writer that updates a md5 hash with all the data it writes (tee)
+
+    Allows to compute the checksum of a stream while writing it to disk,
+    instead of re-reading the written file afterwards.
+    """
+
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        self._hash = MD5.new()
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        return self.fp.write(data)
+
+    def hexdigest(self) -> str:
+        """ Return the md5 hash of all the data written so far """
+        return self._hash.hexdigest()
+
+
+def write_hashed(source: BinaryIO, target: Path, chunk_size: int = 1024 * 1024) -> str:
+    """ Write the contents of a binary stream into a file & return the md5 of the written data """
+    with target.open('wb') as fp:
+        writer = HashedWriter(fp)
+        shutil.copyfileobj(source, writer, chunk_size)
+    return writer.hexdigest()
+
+
+async def write_hashed_async(source, target: Path, chunk_size: int = 1024 * 1024) -> str:
+    """ Write the contents of an async stream into a file & return the md5 of the written data
+
+    The source is read chunk by chunk using its async read method (ex: fastapi.UploadFile),
+    disk writes & hashing of each chunk are offloaded to a thread to keep the event loop free.
+    """
+    loop = asyncio.get_running_loop()
+    fp = await loop.run_in_executor(None, target.open, 'wb')
+    writer = HashedWriter(fp)
+    try:
+        while True:
+            chunk = await source.read(chunk_size)
+            if not chunk:
+                break
+            await loop.run_in_executor(None, writer.write, chunk)
+    finally:
+        await loop.run_in_executor(None, fp.close)
+    return writer.hexdigest()
+
+
+def _split_members(members: List[ZipInfo], nb_batches: int) -> List[List[ZipInfo]]:
+    """ Split archive members into contiguous batches of similar (compressed) size """
+    total = sum(m.compress_size for m in members) or 1
+    batches = [[] for _ in range(nb_batches)]
+    current = 0
+    for m in members:
+        batches[min(int(current * nb_batches / total), nb_batches - 1)].append(m)
+        current += m.compress_size
+    return [b for b in batches if b]
+
+
+def unzip(archive: Union[Path, BinaryIO, Callable[[], BinaryIO]], output: Path, *, workers: int = 1,
+          on_progress: Optional[Callable[[int, int], None]] = None):
+    """ Unzips contents of a zip archive into the output directory
+
+    :param archive: the zip archive as a path, a seekable binary stream, or a callable returning a new stream
+    :param output: directory to extract the contents into
+    :param workers: number of threads used for extraction, each thread uses its own handle on the archive
+        (an already open stream cannot be shared, so it is always extracted by a single thread)
+    :param on_progress: callback called with (nb_extracted, nb_total) as the extraction progresses
+    """
+    def open_archive() -> ZipFile:
+        return ZipFile(archive() if callable(archive) else archive, 'r')
+
+    def close_archive(zip_obj: ZipFile):
+        fp = zip_obj.fp
+        zip_obj.close()
+        # streams created from a callable are owned by us and closed with the archive
+        if callable(archive) and fp is not None:
+            fp.close()
+
     # create folder if it does not exist
     output.mkdir(exist_ok=True, parents=True)
-    # open & extract
-    with ZipFile(archive, 'r') as zipObj:
-        zipObj.extractall(output)
+
+    zip_obj = open_archive()
+    try:
+        members = zip_obj.infolist()
+        if not (isinstance(archive, Path) or callable(archive)):
+            workers = 1
+
+        # pre-create all directories in one pass
+        root = output.resolve()
+        directories = {(root / m.filename).parent for m in members}
+        directories.update(root / m.filename for m in members if m.is_dir())
+        for d in sorted(directories):
+            if d == root or root in d.resolve().parents:
+                d.mkdir(exist_ok=True, parents=True)
+
+        total = len(members)
+        report_every = max(1, total // 20)
+        progress_lock = threading.Lock()
+        extracted = 0
+
+        def extract(batch: List[ZipInfo], handle: ZipFile):
+            nonlocal extracted
+            for member in batch:
+                handle.extract(member, output)
+                with progress_lock:
+                    extracted += 1
+                    if on_progress is not None and (extracted % report_every == 0 or extracted == total):
+                        on_progress(extracted, total)
+
+        def extract_with_own_handle(batch: List[ZipInfo]):
+            handle = open_archive()
+            try:
+                extract(batch, handle)
+            finally:
+                close_archive(handle)
+
+        if workers <= 1 or total <= 1:
+            extract(members, zip_obj)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # consume results to propagate exceptions
+                list(executor.map(extract_with_own_handle, _split_members(members, workers)))
+    finally:
+        close_archive(zip_obj)
 
 
 def zip_folder(archive_file: Path, location: Path):
@@ -1,16 +1,18 @@
+import bisect
+import io
+import os
 import shutil
 import subprocess
 import tempfile
+from hmac import compare_digest
 from pathlib import Path
 from shutil import which
-from typing import List, Tuple
+from typing import List, Dict, BinaryIO, Optional, Callable
 
-import numpy as np
-import pandas as pd
-from fsplit.filesplit import Filesplit
+from Crypto.Hash import MD5
 
 from vocolab.db import models
-from .commons import md5sum
+from .commons import md5sum, unzip
 
 
 def split_zip_v1(zipfile: Path, chunk_max_size: str = "500m", hash_parts: bool = False):
@@ -52,6 +54,10 @@ def split_zip_v1(zipfile: Path, chunk_max_size: str = "500m", hash_parts: bool =
 
 # noinspection PyTypeChecker
 def split_zip_v2(zipfile: Path, chunk_max_size: int = 500000000, hash_parts: bool = False):
+    # heavy imports are only loaded when needed
+    import pandas as pd
+    from fsplit.filesplit import Filesplit
+
     assert zipfile.is_file(), f"entry file ({zipfile}) was not found"
     tmp_loc = Path(tempfile.mkdtemp(dir=f"{zipfile.parents[0]}"))
     fs = Filesplit()
@@ -59,9 +65,15 @@ def split_zip_v2(zipfile: Path, chunk_max_size: int = 500000000, hash_parts: boo
     df = pd.read_csv(tmp_loc / 'fs_manifest.csv')
     if hash_parts:
         df['hash'] = df.apply(lambda row: md5sum((tmp_loc / row['filename'])), axis=1)
-        index: List[Tuple[str, int, str]] = list(zip(df['filename'], df['filesize'], df['hash']))
+        index: List[Dict] = [
+            dict(file_name=name, file_size=size, file_hash=h)
+            for name, size, h in zip(df['filename'], df['filesize'], df['hash'])
+        ]
     else:
-        index: List[Tuple[str, int]] = list(zip(df['filename'], df['filesize']))
+        index: List[Dict] = [
+            dict(file_name=name, file_size=size)
+            for name, size in zip(df['filename'], df['filesize'])
+        ]
 
     return models.file_split.SplitManifest(
         filename=zipfile.name,
@@ -73,6 +85,11 @@ def split_zip_v2(zipfile: Path, chunk_max_size: int = 500000000, hash_parts: boo
 
 
 def merge_zip_v2(manifest: models.file_split.SplitManifest, output_location: Path, clean: bool = True):
+    # heavy imports are only loaded when needed
+    import numpy as np
+    import pandas as pd
+    from fsplit.filesplit import Filesplit
+
     if manifest.hashed_parts:
         for item in manifest.index:
             assert md5sum(manifest.tmp_location / item.file_name) == item.file_hash, \
@@ -95,16 +112,234 @@ def merge_zip_v2(manifest: models.file_split.SplitManifest, output_location: Pat
     return output_location / manifest.filename
 
 
-""" V2 is the preferred method to be used 
+def _append_file(source: Path, out_fp: BinaryIO):
+    """ Append the contents of source at the end of an open (unbuffered) binary file
+
+    Uses zero-copy kernel functions (os.copy_file_range or os.sendfile) when available,
+    and falls back to a buffered copy when the platform or filesystem does not support them.
+    """
+    size = source.stat().st_size
+    copied = 0
+    with source.open('rb', buffering=0) as in_fp:
+        try:
+            while copied < size:
+                if hasattr(os, 'copy_file_range'):
+                    sent = os.copy_file_range(in_fp.fileno(), out_fp.fileno(), size - copied, copied)
+                else:
+                    sent = os.sendfile(out_fp.fileno(), in_fp.fileno(), copied, size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            # zero-copy not supported => copy the rest through userspace
+            in_fp.seek(copied)
+            shutil.copyfileobj(in_fp, out_fp)
+
+
+def _sequential_md5(location: Path, chunk_size: int = 1024 * 1024) -> str:
+    """ Compute the md5 of a file in a single sequential pass (hints the kernel to read ahead) """
+    h = MD5.new()
+    with location.open('rb', buffering=0) as fp:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fp.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def merge_zip_v3(manifest: models.file_split.SplitManifest, output_location: Path, clean: bool = True,
+                 verify: bool = True, chunk_size: int = 1024 * 1024):
+    """ Merge the parts of a split archive back into one file (native implementation)
+
+    Parts are concatenated in the order of the manifest index using zero-copy kernel functions,
+    their individual hashes are not re-checked as they are verified on reception (see _fs.submissions.multipart_add).
+
+    :param manifest: the split manifest describing the parts
+    :param output_location: the directory to write the merged file in
+    :param clean: if True the directory containing the parts is deleted after merging
+    :param verify: if True the md5 of the merged file is compared to the manifest (separate sequential
+        read pass, the merged data is usually still in the page cache)
+    :param chunk_size: size of the chunks used when the data is hashed
+    :raises ValueError: if the merged file does not match the original md5 (the merged file is removed)
+    """
+    output_file = output_location / manifest.filename
+
+    with output_file.open('wb', buffering=0) as out_fp:
+        for item in manifest.index:
+            _append_file(manifest.tmp_location / item.file_name, out_fp)
+
+    if verify and not compare_digest(_sequential_md5(output_file, chunk_size), manifest.hash):
+        output_file.unlink()
+        raise ValueError("output file does not match original md5")
+
+    if clean:
+        shutil.rmtree(manifest.tmp_location)
+    return output_file
+
+
+class MultiFileReader(io.RawIOBase):
+    """ Read-only seekable stream over an ordered list of files, as if they were concatenated
+
+    Allows to open the parts of a split archive (with ZipFile, etc.) without merging them on disk.
+    Data is hashed (md5) on the fly as long as it is read contiguously from the start of the stream,
+    see hexdigest.
+    """
+
+    def __init__(self, files: List[Path]):
+        super().__init__()
+        self._files = list(files)
+        # start offset of each file in the stream (last item is the total size)
+        self._offsets = [0]
+        for f in self._files:
+            self._offsets.append(self._offsets[-1] + f.stat().st_size)
+        self._pos = 0
+        self._current = None
+        self._hash = MD5.new()
+        self._hashed_upto = 0
+
+    @property
+    def size(self) -> int:
+        return self._offsets[-1]
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def _open_part(self, index: int) -> BinaryIO:
+        """ Returns the file object of a part (only one part is kept open at a time) """
+        if self._current is None or self._current[0] != index:
+            self._close_part()
+            self._current = (index, self._files[index].open('rb', buffering=0))
+        return self._current[1]
+
+    def _close_part(self):
+        if self._current is not None:
+            self._current[1].close()
+            self._current = None
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast('B')
+        total = 0
+        # fill the buffer, crossing part boundaries if needed (callers like ZipFile expect full reads)
+        while total < len(view) and self._pos < self.size:
+            index = bisect.bisect_right(self._offsets, self._pos) - 1
+            fp = self._open_part(index)
+            fp.seek(self._pos - self._offsets[index])
+            chunk = view[total:total + min(len(view) - total, self._offsets[index + 1] - self._pos)]
+            nb_read = fp.readinto(chunk)
+            if not nb_read:
+                break
+
+            # hash data that extends the contiguous hashed region
+            start = self._pos
+            if start <= self._hashed_upto < start + nb_read:
+                self._hash.update(chunk[self._hashed_upto - start:nb_read])
+                self._hashed_upto = start + nb_read
+
+            self._pos += nb_read
+            total += nb_read
+        return total
+
+    def hexdigest(self, chunk_size: int = 1024 * 1024) -> str:
+        """ Return the md5 of the whole stream
+
+        Only the data that was not yet read contiguously from the start is read to complete the hash.
+        """
+        pos = self._pos
+        self._pos = self._hashed_upto
+        while self._hashed_upto < self.size:
+            if not self.read(chunk_size):
+                break
+        self._pos = pos
+        return self._hash.hexdigest()
+
+    def close(self):
+        self._close_part()
+        super().close()
+
+
+def _move_contents(source: Path, target: Path):
+    """ Move the contents of a directory into another one (on the same filesystem) """
+    target.mkdir(exist_ok=True, parents=True)
+    for item in source.iterdir():
+        dest = target / item.name
+        if dest.is_dir() and item.is_dir():
+            _move_contents(item, dest)
+        else:
+            os.replace(item, dest)
+
+
+def unzip_parts(manifest: models.file_split.SplitManifest, output: Path, clean: bool = True, verify: bool = True,
+                workers: int = 1, on_progress: Optional[Callable[[int, int], None]] = None):
+    """ Extract a split archive directly from its parts (no merged archive is written on disk)
+
+    :param manifest: the split manifest describing the parts
+    :param output: the directory to extract the archive in
+    :param clean: if True the directory containing the parts is deleted after extraction
+    :param verify: if True the md5 of the archive is compared to the manifest, in single threaded mode
+        it is computed while the archive is streamed, in parallel mode it requires a separate read pass
+    :param workers: number of threads used for extraction (see commons.unzip)
+    :param on_progress: extraction progress callback (see commons.unzip)
+    :raises ValueError: if the parts do not match the original md5 (nothing is extracted into output)
+    """
+    parts = [manifest.tmp_location / item.file_name for item in manifest.index]
+
+    if workers > 1:
+        if verify:
+            with MultiFileReader(parts) as reader:
+                if not compare_digest(reader.hexdigest(), manifest.hash):
+                    raise ValueError("archive parts do not match original md5")
+
+        unzip(lambda: MultiFileReader(parts), output, workers=workers, on_progress=on_progress)
+    else:
+        # extract in a temporary directory, files are only moved into output once the archive is verified
+        output.parent.mkdir(exist_ok=True, parents=True)
+        tmp_output = Path(tempfile.mkdtemp(prefix=f".{output.name}.", dir=output.parent))
+        try:
+            with MultiFileReader(parts) as reader:
+                unzip(reader, tmp_output, on_progress=on_progress)
+
+                if verify and not compare_digest(reader.hexdigest(), manifest.hash):
+                    raise ValueError("archive parts do not match original md5")
+            _move_contents(tmp_output, output)
+        finally:
+            shutil.rmtree(tmp_output, ignore_errors=True)
+
+    if clean:
+        shutil.rmtree(manifest.tmp_location)
+
+
+""" V2 is the preferred method for splitting, V3 for merging
 Notes: 
     - V2 depends on https://pypi.org/project/filesplit/
     - V1 should probably not be used and exists as a note in case i need an example implementation
+    - merge V3 is a native implementation (no filesplit/pandas), it only depends on the SplitManifest
+      and can merge parts created by any split version.
+    - unzip_parts allows to skip the merge altogether by extracting from the parts.
 
 If the dependency on filesplit must be removed its better to create a more stable V3 based on V1
 
-!!! Always use same split as merge as merge_v2 depends on manifest created during split
-
 Normalized function names to hide versioning to external users
 """
 split_zip = split_zip_v2
-merge_zip = merge_zip_v2
+merge_zip = merge_zip_v3
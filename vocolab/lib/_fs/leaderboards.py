@@ -1,6 +1,27 @@
-from vocolab import get_settings
+import fcntl
+import gzip
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Iterable
+from uuid import uuid4
 
-from .commons import load_dict_file
+from Crypto.Hash import MD5
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from vocolab import get_settings, out
+from vocolab.lib import misc
+
+from .commons import load_dict_file, md5sum
 from .submissions import get_submission_dir
 
 _settings = get_settings()
@@ -14,9 +35,288 @@ def get_leaderboard_archive_location():
     return _settings.DATA_FOLDER / 'archive'
 
 
+# in-process LRU cache of parsed entry files: path -> ((mtime, size), content)
+_entry_cache: "OrderedDict[Path, Tuple[Tuple[int, int], Dict]]" = OrderedDict()
+_entry_cache_lock = threading.Lock()
+_ENTRY_CACHE_SIZE = 1024
+
+
+def load_entry_file(location: Path) -> Optional[Dict]:
+    """ Load a leaderboard entry file
+
+    Parsed contents are cached in memory (least recently used files are evicted first)
+    and only re-parsed when the mtime or size of the file changes.
+    :returns a shallow copy of the entry, None if the file does not exist
+    """
+    try:
+        stat = location.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        with _entry_cache_lock:
+            _entry_cache.pop(location, None)
+        return None
+
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _entry_cache_lock:
+        cached = _entry_cache.get(location)
+        if cached is not None and cached[0] == stamp:
+            _entry_cache.move_to_end(location)
+            return dict(cached[1])
+
+    content = load_dict_file(location)
+    with _entry_cache_lock:
+        _entry_cache[location] = (stamp, content)
+        _entry_cache.move_to_end(location)
+        while len(_entry_cache) > _ENTRY_CACHE_SIZE:
+            _entry_cache.popitem(last=False)
+    return dict(content)
+
+
+def load_scores_bundle(submission_id: str, entry_files: Iterable[str]) -> Dict[str, Dict]:
+    """ Load all the leaderboard entry files of a submission in one go
+
+    :param submission_id: the id of the submission
+    :param entry_files: filenames of the entries (as defined by each leaderboard)
+    :returns a dict mapping entry filenames to their content (missing entries are omitted)
+    """
+    location = get_submission_dir(submission_id)
+    bundle = {}
+    for entry_file in set(entry_files):
+        entry = load_entry_file(location / entry_file)
+        if entry is not None:
+            bundle[entry_file] = entry
+    return bundle
+
+
 def load_entry_from_sub(submission_id: str, leaderboard_entry: str):
     """ Load a leaderboard entry from a submission dir """
-    location = get_submission_dir(submission_id)
-    if (location / leaderboard_entry).is_file():
-        return load_dict_file(location / leaderboard_entry)
-    return {}
+    return load_scores_bundle(submission_id, [leaderboard_entry]).get(leaderboard_entry, {})
+
+
+# precompressed variants of compiled leaderboards (content-encoding: file suffix), by order of preference
+COMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def _atomic_write(location: Path, content: bytes):
+    """ Write a file atomically (temp file + rename), readers never see a partially written file """
+    tmp_file = location.with_name(f".{location.name}.{uuid4().hex}.tmp")
+    tmp_file.write_bytes(content)
+    os.replace(tmp_file, location)
+
+
+def compressed_variant(location: Path, encoding: str) -> Path:
+    """ Location of the precompressed variant of a file """
+    return location.with_name(f"{location.name}{COMPRESSED_SUFFIXES[encoding]}")
+
+
+def get_entry_keys_location(location: Path) -> Path:
+    """ Location of the entry keys of a compiled leaderboard (kept hidden, submission ids are not public) """
+    return location.with_name(f".{location.name}.keys.json")
+
+
+def write_leaderboard(location: Path, entries: List[Dict], keys: Optional[Dict] = None) -> Path:
+    """ Write a compiled leaderboard file & its precompressed variants (.gz & .br if brotli is installed)
+
+    Files are written atomically, readers never see a partially written leaderboard.
+    :param keys: metadata of the entries (see load_entry_keys), stored next to the leaderboard
+    """
+    updated_on = datetime.now().isoformat()
+    content = misc.json_dumps(dict(
+        updatedOn=updated_on,
+        data=entries
+    ))
+
+    # variants are written after the file (variants older than the file are considered stale)
+    _atomic_write(location, content)
+    _atomic_write(compressed_variant(location, 'gzip'), gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _atomic_write(compressed_variant(location, 'br'), brotli.compress(content))
+
+    keys_file = get_entry_keys_location(location)
+    if keys is None:
+        keys_file.unlink(missing_ok=True)
+    else:
+        _atomic_write(keys_file, misc.json_dumps(dict(keys, updatedOn=updated_on)))
+    return location
+
+
+def load_entry_keys(location: Path) -> Optional[Tuple[Dict, List[Dict]]]:
+    """ Load the entries of a compiled leaderboard along with their keys
+
+    :returns the keys & the entries, None if the keys are missing or do not match the compiled file
+    """
+    keys_file = get_entry_keys_location(location)
+    if not (location.is_file() and keys_file.is_file()):
+        return None
+
+    keys = misc.json_loads(keys_file.read_bytes())
+    data = misc.json_loads(location.read_bytes())
+    entries = data.get('data', [])
+    if keys.get('updatedOn') != data.get('updatedOn') or len(keys.get('submissions', [])) != len(entries):
+        return None
+    return keys, entries
+
+
+@asynccontextmanager
+async def leaderboard_lock(location: Path):
+    """ Hold an exclusive lock on a compiled leaderboard (across processes)
+
+    Must be held while gathering the entries & writing a leaderboard, concurrent builds
+    would otherwise overwrite each other's entries.
+    The lock is acquired in a thread-pool to avoid blocking the event loop.
+    """
+    location.parent.mkdir(exist_ok=True, parents=True)
+    with location.with_name(f".{location.name}.lock").open('a') as fp:
+        await run_in_threadpool(fcntl.flock, fp.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+class CompiledLeaderboard(NamedTuple):
+    """ Serialized content of a compiled leaderboard file """
+    content: bytes
+    etag: str
+    stamp: Tuple  # (mtime, size) of the file & its compressed variants
+    encoded: Dict[str, bytes]  # precompressed variants of the content by content-encoding
+
+    def etag_for(self, encoding: Optional[str] = None) -> str:
+        """ ETag of the representation using the given content-encoding """
+        if encoding is None:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+def _file_stamp(location: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = location.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# in-process cache of compiled leaderboards (invalidated when the file changes on disk)
+_compiled_cache: Dict[Path, CompiledLeaderboard] = {}
+
+
+def load_compiled_leaderboard(location: Path) -> Optional[CompiledLeaderboard]:
+    """ Load the serialized content of a compiled leaderboard
+
+    Contents are cached in memory and only re-read when the mtime or size of the file
+    (or of its precompressed variants) changes.
+    :returns None if the leaderboard was not compiled
+    """
+    file_stamp = _file_stamp(location)
+    if file_stamp is None:
+        _compiled_cache.pop(location, None)
+        return None
+
+    variants = {enc: compressed_variant(location, enc) for enc in COMPRESSED_SUFFIXES}
+    variant_stamps = {enc: _file_stamp(v) for enc, v in variants.items()}
+    stamp = (file_stamp, tuple(variant_stamps.values()))
+
+    cached = _compiled_cache.get(location)
+    if cached is not None and cached.stamp == stamp:
+        return cached
+
+    content = location.read_bytes()
+    compiled = CompiledLeaderboard(
+        content=content,
+        etag=f'"{MD5.new(content).hexdigest()}"',
+        stamp=stamp,
+        encoded={
+            enc: v.read_bytes()
+            for enc, v in variants.items()
+            # skip variants from a previous build
+            if variant_stamps[enc] is not None and variant_stamps[enc][0] >= file_stamp[0]
+        }
+    )
+    _compiled_cache[location] = compiled
+    return compiled
+
+
+def get_static_store_location() -> Path:
+    """ Location of the content-addressed store of leaderboard static files """
+    return _settings.static_files_directory / 'leaderboards' / '.store'
+
+
+def _link_into_place(obj: Path, dest: Path):
+    """ Place a store object at the given destination (hard link, symlink or copy as a fallback) """
+    tmp_file = dest.with_name(f".{dest.name}.{uuid4().hex}.tmp")
+    try:
+        os.link(obj, tmp_file)
+    except OSError:
+        try:
+            os.symlink(obj, tmp_file)
+        except OSError:
+            shutil.copyfile(obj, tmp_file)
+    os.replace(tmp_file, dest)
+
+
+def get_static_manifest_location(target: Path) -> Path:
+    """ Location of the manifest of a static files directory (kept outside the served directory) """
+    return _settings.leaderboard_dir / '.static' / f"{target.name}.manifest.json"
+
+
+def publish_static_files(sources: List[Path], target: Path) -> int:
+    """ Publish the static files of a list of directories into target
+
+    Files are stored once in a content-addressed store & linked into target by name (subdirectories
+    are flattened, as static files have always been published).
+    When multiple sources contain a file with the same name the last one is published (& a warning is logged).
+    Files whose source (path, mtime & size) did not change since the last publication are skipped,
+    files whose source no longer exists are removed. The digests of published files are kept
+    in a manifest (see get_static_manifest_location).
+    :returns the number of files (re)published
+    """
+    store = get_static_store_location()
+    manifest_file = get_static_manifest_location(target)
+    target.mkdir(exist_ok=True, parents=True)
+    manifest_file.parent.mkdir(exist_ok=True, parents=True)
+    # manifests used to be written inside the (publicly served) target
+    (target / '.manifest.json').unlink(missing_ok=True)
+
+    manifest = {}
+    if manifest_file.is_file():
+        manifest = misc.read_json(manifest_file)
+
+    # prune files whose source was removed (& files published with their relative path by earlier versions)
+    pruned = [name for name, previous in manifest.items() if '/' in name or not Path(previous[0]).is_file()]
+    for name in pruned:
+        (target / name).unlink(missing_ok=True)
+        del manifest[name]
+
+    files: Dict[str, Path] = {}
+    for source in sources:
+        for file in sorted(f for f in source.rglob('*') if f.is_file()):
+            if file.name in files:
+                out.log.warning(f"static file {file.name} of {files[file.name]} is overridden by {file}")
+            files[file.name] = file
+
+    published = 0
+    for name, file in files.items():
+        dest = target / name
+        stat = file.stat()
+        stamp = [str(file), stat.st_mtime_ns, stat.st_size]
+
+        previous = manifest.get(name)
+        if previous is not None and previous[:3] == stamp and (dest.exists() or dest.is_symlink()):
+            continue
+
+        digest = md5sum(file, chunk_size=1024 * 1024)
+        obj = store / digest[:2] / digest
+        if not obj.is_file():
+            obj.parent.mkdir(exist_ok=True, parents=True)
+            tmp_obj = obj.with_name(f".{digest}.{uuid4().hex}.tmp")
+            shutil.copyfile(file, tmp_obj)
+            os.replace(tmp_obj, obj)
+
+        _link_into_place(obj, dest)
+        manifest[name] = [*stamp, digest]
+        published += 1
+
+    if published > 0 or len(pruned) > 0:
+        tmp_manifest = manifest_file.with_name(f".{manifest_file.name}.{uuid4().hex}.tmp")
+        misc.write_json(tmp_manifest, manifest)
+        os.replace(tmp_manifest, manifest_file)
+    return published
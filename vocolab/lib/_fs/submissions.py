@@ -1,17 +1,20 @@
+import os
 import shutil
 
-import json
 from datetime import datetime
 from pathlib import Path
 from hmac import compare_digest
-from typing import Dict, List, Union
+from typing import Dict, List, Union, Set
+from uuid import uuid4
 
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 
 from vocolab import get_settings, exc
 from vocolab.db import models
+from vocolab.lib import misc
 
-from .commons import md5sum, rsync, ssh_exec, zip_folder
+from .commons import rsync, ssh_exec, zip_folder, write_hashed, write_hashed_async
 
 _settings = get_settings()
 
@@ -137,13 +140,11 @@ class SubmissionDir:
 
     @property
     def info(self) -> Union[Dict, List]:
-        with self.info_file.open() as fp:
-            return json.load(fp)
+        return misc.read_json(self.info_file)
 
     @info.setter
     def info(self, data: Dict):
-        with self.info_file.open('w') as fp:
-            json.dump(data, fp, indent=4)
+        misc.write_json(self.info_file, data, indent=True)
 
     @property
     def multipart_dir(self) -> Path:
@@ -159,6 +160,15 @@ class SubmissionDir:
         """
         return self.multipart_dir / 'upload.json'
 
+    @property
+    def multipart_receipts(self) -> Path:
+        """ multipart receipts dir contains one marker file per received & verified part
+
+        Each part is acknowledged by its own file (created atomically), this allows parts
+        to be uploaded in parallel without rewriting a shared manifest.
+        """
+        return self.multipart_dir / 'received'
+
     def is_multipart(self) -> bool:
         return self.multipart_dir.is_dir() and self.multipart_index.is_file()
 
@@ -241,12 +251,12 @@ def make_submission_on_disk(submission_id: str, username: str, track: str, meta:
 
     if meta.multipart:
         submission_dir.multipart_dir.mkdir(exist_ok=True)
+        submission_dir.multipart_receipts.mkdir(exist_ok=True)
         # add tmp to data
         upload_data = meta.dict()
         upload_data["tmp_location"] = str(submission_dir.multipart_dir)
         # write info to disk
-        with submission_dir.multipart_index.open('w') as fp:
-            json.dump(upload_data, fp)
+        misc.write_json(submission_dir.multipart_index, upload_data)
     else:
         with submission_dir.singlepart_hash.open('w') as fp:
             fp.write(meta.hash)
@@ -258,6 +268,83 @@ def make_submission_on_disk(submission_id: str, username: str, track: str, meta:
     submission_dir.upload_lock.touch()
 
 
+def _multipart_part_hash(submission_id: str, filename: str, logger: SubmissionLogger) -> str:
+    """ Lookup the expected hash of a part in the multipart manifest
+
+    :raises ResourceRequestedNotFound: if file not present in the manifest
+    """
+    submission_dir = get_submission_dir(submission_id, as_obj=True)
+    mf_data = models.file_split.SplitManifest(**misc.read_json(submission_dir.multipart_index))
+
+    f_hash = next((val.file_hash for val in mf_data.index if val.file_name == filename), None)
+    # file not found in submission => raise exception
+    if f_hash is None:
+        logger.log(f"(ERROR) file {filename} was not found in manifest, upload canceled!!")
+        raise exc.ResourceRequestedNotFound(f"Part {filename} is not part of submission {submission_id}!!")
+    return f_hash
+
+
+def _multipart_tmp_part(submission_id: str, filename: str) -> Path:
+    """ Unique temporary location to write a part before it is verified """
+    submission_dir = get_submission_dir(submission_id, as_obj=True)
+    return submission_dir.multipart_dir / f"{filename}.{uuid4().hex}.part"
+
+
+def multipart_received(submission_id: str, mf_data: models.file_split.SplitManifest) -> Set[str]:
+    """ Returns the names of the parts that have been received & verified """
+    submission_dir = get_submission_dir(submission_id, as_obj=True)
+    # parts recorded in the manifest (uploads started before the receipts dir existed)
+    received = {item.file_name for item in mf_data.received}
+    if submission_dir.multipart_receipts.is_dir():
+        received.update(
+            f.name for f in submission_dir.multipart_receipts.iterdir() if not f.name.startswith('.')
+        )
+    return received
+
+
+def _multipart_register_part(submission_id: str, filename: str, tmp_part: Path, calc_hash: str, f_hash: str,
+                             logger: SubmissionLogger):
+    """ Verify a written part & mark it as received
+
+    The verified part is moved into place & acknowledged by a receipt file, both operations
+    are atomic renames, which makes concurrent uploads of parts (from multiple threads/processes) safe.
+
+    :return: completed, list_remaining
+    :raises ValueNotValid if md5 hash of file does not match md5 recorded in the manifest
+    """
+    submission_dir = get_submission_dir(submission_id, as_obj=True)
+    file_part = submission_dir.multipart_dir / f"{filename}"
+
+    # Verify checksum
+    if not compare_digest(calc_hash, f_hash):
+        # remove file and throw exception
+        tmp_part.unlink()
+        data = f"failed hash comparison" \
+               f"file: {file_part} with hash {calc_hash}" \
+               f"on record found : {filename} with hash {f_hash}"
+        logger.log(f"(ERROR) {data}, upload canceled!!")
+        raise exc.ValueNotValid("Hash of part does not match given hash", data=data)
+
+    # move part into place
+    os.replace(tmp_part, file_part)
+
+    # write receipt for part
+    submission_dir.multipart_receipts.mkdir(exist_ok=True)
+    tmp_receipt = submission_dir.multipart_receipts / f".{filename}.{uuid4().hex}"
+    with tmp_receipt.open('w') as fp:
+        fp.write(calc_hash)
+    os.replace(tmp_receipt, submission_dir.multipart_receipts / f"{filename}")
+
+    mf_data = models.file_split.SplitManifest(**misc.read_json(submission_dir.multipart_index))
+
+    received = multipart_received(submission_id, mf_data)
+    remaining = [item for item in mf_data.index if item.file_name not in received]
+    logger.log(f" --> part was added successfully", append=True)
+
+    # return --> is_completed
+    return len(remaining) == 0, remaining
+
+
 def multipart_add(submission_id: str, filename: str, data: UploadFile):
     """ Add a part to a multipart upload type submission.
 
@@ -279,48 +366,71 @@ def multipart_add(submission_id: str, filename: str, data: UploadFile):
     """
     logger = SubmissionLogger(submission_id)
     logger.log(f"adding a new part to upload: tmp/{filename}")
-    submission_dir = get_submission_dir(submission_id, as_obj=True)
-    with submission_dir.multipart_index.open() as fp:
-        mf_data = models.file_split.SplitManifest(**json.load(fp))
+    f_hash = _multipart_part_hash(submission_id, filename, logger)
 
-    # lookup hash
-    file_meta = next(((val.file_hash, ind) for ind, val in enumerate(mf_data.index) if val.file_name == filename), None)
-    # file not found in submission => raise exception
-    if file_meta is None:
-        logger.log(f"(ERROR) file {filename} was not found in manifest, upload canceled!!")
-        raise exc.ResourceRequestedNotFound(f"Part {filename} is not part of submission {submission_id}!!")
+    # Add the part (checksum is computed while writing)
+    tmp_part = _multipart_tmp_part(submission_id, filename)
+    try:
+        calc_hash = write_hashed(data.file, tmp_part)
+    except BaseException:
+        # interrupted upload (client disconnect, disk full...) => do not keep the partial file
+        tmp_part.unlink(missing_ok=True)
+        raise
 
-    f_hash, file_index = file_meta
+    return _multipart_register_part(submission_id, filename, tmp_part, calc_hash, f_hash, logger)
 
-    # Add the part
-    file_part = submission_dir.multipart_dir / f"{filename}"
-    with file_part.open('wb') as fp:
-        for d in data.file:
-            fp.write(d)
 
-    # Verify checksum
-    calc_hash = md5sum(submission_dir.multipart_dir / f"{filename}")
-    if not compare_digest(calc_hash, f_hash):
-        # remove file and throw exception
-        (submission_dir.multipart_dir / f"{filename}").unlink()
-        data = f"failed hash comparison" \
-               f"file: {submission_dir.multipart_dir / f'{filename}'} with hash {calc_hash}" \
-               f"on record found : {filename} with hash {f_hash}"
-        logger.log(f"(ERROR) {data}, upload canceled!!")
-        raise exc.ValueNotValid("Hash of part does not match given hash", data=data)
+async def multipart_add_async(submission_id: str, filename: str, data: UploadFile):
+    """ Add a part to a multipart upload type submission without blocking the event loop.
 
-    # up count of received parts
-    mf_data.received.append(mf_data.index[file_index])
+    Same as multipart_add, but the part is read from the request in chunks and
+    disk writes, hashing & part registration are run in a thread-pool.
+    """
+    logger = SubmissionLogger(submission_id)
+    logger.log(f"adding a new part to upload: tmp/{filename}")
+    f_hash = await run_in_threadpool(_multipart_part_hash, submission_id, filename, logger)
 
-    # write new metadata
-    with submission_dir.multipart_index.open('w') as fp:
-        fp.write(mf_data.json())
+    # Add the part (checksum is computed while writing)
+    tmp_part = _multipart_tmp_part(submission_id, filename)
+    try:
+        calc_hash = await write_hashed_async(data, tmp_part)
+    except BaseException:
+        # interrupted upload (client disconnect, disk full...) => do not keep the partial file
+        tmp_part.unlink(missing_ok=True)
+        raise
 
-    remaining = list(set(mf_data.index) - set(mf_data.received))
-    logger.log(f" --> part was added successfully", append=True)
+    return await run_in_threadpool(
+        _multipart_register_part, submission_id, filename, tmp_part, calc_hash, f_hash, logger
+    )
 
-    # return --> is_completed
-    return len(mf_data.received) == len(mf_data.index), remaining
+
+def _singlepart_hash(submission_id: str, filename: str, logger: SubmissionLogger) -> str:
+    """ Load the expected hash of a singlepart upload
+
+    :raises ResourceRequestedNotFound: if submission has no hash file
+    """
+    submission_dir = get_submission_dir(submission_id, as_obj=True)
+    # hash not found in submission => raise exception
+    if not submission_dir.singlepart_hash.is_file():
+        logger.log(f"(ERROR) file {filename} was not found in manifest, upload canceled!!")
+        raise exc.ResourceRequestedNotFound(f"Part {filename} is not part of submission {submission_id}!!")
+
+    with submission_dir.singlepart_hash.open() as fp:
+        return fp.read().replace('\n', '')
+
+
+def _singlepart_verify(calc_hash: str, f_hash: str, logger: SubmissionLogger):
+    """ Verify the checksum of a singlepart upload
+
+    :return: True, []
+    :raises ValueNotValid if md5 hash of file does not match expected md5
+    """
+    if not compare_digest(calc_hash, f_hash):
+        raise exc.ValueNotValid("Hash does not match expected!")
+
+    logger.log(f" --> file was uploaded successfully", append=True)
+    # completed => True
+    return True, []
 
 
 def singlepart_add(submission_id: str, filename: str, data: UploadFile):
@@ -343,27 +453,29 @@ def singlepart_add(submission_id: str, filename: str, data: UploadFile):
     submission_dir = get_submission_dir(submission_id, as_obj=True)
     logger = SubmissionLogger(submission_id)
     logger.log(f"adding a new part to upload: {filename}")
+    f_hash = _singlepart_hash(submission_id, filename, logger)
 
-    # hash not found in submission => raise exception
-    if not submission_dir.singlepart_hash.is_file():
-        logger.log(f"(ERROR) file {filename} was not found in manifest, upload canceled!!")
-        raise exc.ResourceRequestedNotFound(f"Part {filename} is not part of submission {submission_id}!!")
+    # Add the part (checksum is computed while writing)
+    calc_hash = write_hashed(data.file, submission_dir.singlepart)
 
-    with submission_dir.singlepart_hash.open() as fp:
-        f_hash = fp.read().replace('\n', '')
+    return _singlepart_verify(calc_hash, f_hash, logger)
 
-    # Add the part
-    with submission_dir.singlepart.open('wb') as fp:
-        for d in data.file:
-            fp.write(d)
 
-    # Verify checksum
-    if not md5sum(submission_dir.singlepart) == f_hash:
-        raise exc.ValueNotValid("Hash does not match expected!")
+async def singlepart_add_async(submission_id: str, filename: str, data: UploadFile):
+    """ Upload data into submission without blocking the event loop. (single file upload, no splitting)
 
-    logger.log(f" --> file was uploaded successfully", append=True)
-    # completed => True
-    return True, []
+    Same as singlepart_add, but the file is read from the request in chunks and
+    disk writes & hashing are run in a thread-pool.
+    """
+    submission_dir = get_submission_dir(submission_id, as_obj=True)
+    logger = SubmissionLogger(submission_id)
+    logger.log(f"adding a new part to upload: {filename}")
+    f_hash = await run_in_threadpool(_singlepart_hash, submission_id, filename, logger)
+
+    # Add the part (checksum is computed while writing)
+    calc_hash = await write_hashed_async(data, submission_dir.singlepart)
+
+    return _singlepart_verify(calc_hash, f_hash, logger)
 
 
 def transfer_submission_to_remote(host: str, submission_id: str):
@@ -1,7 +1,6 @@
-import json
-
 from vocolab import get_settings, exc
 from vocolab.db import models
+from vocolab.lib import misc
 
 _settings = get_settings()
 
@@ -10,8 +9,7 @@ def get_user_data(username: str) -> models.api.UserData:
     db_file = (_settings.user_data_dir / f"{username}.json")
     if not db_file.is_file():
         raise exc.UserNotFound('user requested has no data entry')
-    with db_file.open() as fp:
-        raw_data = json.load(fp)
+    raw_data = misc.read_json(db_file)
     return models.api.UserData(**raw_data)
 
 
@@ -19,5 +17,4 @@ def update_user_data(username: str, data: models.api.UserData):
     if not _settings.user_data_dir.is_dir():
         _settings.user_data_dir.mkdir(parents=True)
 
-    with (_settings.user_data_dir / f"{username}.json").open('w') as fp:
-        json.dump(data.dict(), fp)
+    misc.write_json(_settings.user_data_dir / f"{username}.json", data.dict())
@@ -1,8 +1,10 @@
 import asyncio
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, Optional, Iterable
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.staticfiles import StaticFiles
 from jinja2 import FileSystemLoader, Environment
 
 from vocolab import settings
@@ -39,7 +41,7 @@ def validate_token(token: str = Depends(oauth2_scheme)) -> schema.Token:
 async def get_user(token: schema.Token = Depends(validate_token)) -> schema.User:
     """ Dependency for fetching current user from database using token entry """
     try:
-        return await userQ.get_user(by_email=token.user_email)
+        return await userQ.get_cached_user(by_email=token.user_email)
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -90,6 +92,52 @@ async def signup(request: Request, user: models.misc.UserCreate):
     )
 
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """ Check if an ETag matches the value of an If-None-Match header (weak comparison) """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == '*':
+        return True
+
+    def strip_weak(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith('W/') else tag
+
+    return strip_weak(etag) in [strip_weak(t) for t in if_none_match.split(',')]
+
+
+def pick_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """ Pick the first of the available content-encodings accepted by the client (Accept-Encoding header) """
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        accepted[name.strip().lower()] = quality
+
+    for encoding in available:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+class PublicStaticFiles(StaticFiles):
+    """ StaticFiles that do not serve hidden files & directories (ex: the static files store) """
+
+    def lookup_path(self, path: str):
+        if any(part.startswith('.') for part in Path(path).parts):
+            return "", None
+        return super().lookup_path(path)
+
+
 def get_base_url(request: Request) -> str:
     base_url = f"{request.base_url}"
 
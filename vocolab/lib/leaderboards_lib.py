@@ -1,8 +1,20 @@
-import json
-from datetime import datetime
-from typing import Dict
+import asyncio
+import bisect
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, NamedTuple, TYPE_CHECKING
 
-from vocolab import out, get_settings
+from fastapi.concurrency import run_in_threadpool
+
+if TYPE_CHECKING:
+    import numpy as np
+
+from vocolab import get_settings
 from vocolab.db import schema
 from vocolab.db.q import leaderboardQ, challengesQ
 from vocolab.lib import _fs, misc
@@ -15,76 +27,369 @@ def get_static_location(label: str):
     return _settings.static_files_directory / 'leaderboards' / label
 
 
+_MISSING = object()
+
+
+def parse_sort_keys(sort_by: str) -> List[Tuple[str, bool]]:
+    """ Parse a comma separated list of dotted keys (prefix with '-' for descending order)
+
+    :returns a list of (key, descending) tuples
+    """
+    return [
+        (k.strip().lstrip('-'), k.strip().startswith('-'))
+        for k in sort_by.split(',') if k.strip().lstrip('-')
+    ]
+
+
+def _lookup(entry: Dict, path: List[str]):
+    """ Fetch a nested value from an entry (_MISSING if not found) """
+    curr = entry
+    for k in path:
+        if not isinstance(curr, dict):
+            return _MISSING
+        curr = curr.get(k, None)
+        if curr is None:
+            return _MISSING
+    return curr
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value  # NaN != NaN
+
+
+def _sort_columns(entries: List[Dict], key: str, descending: bool) -> List["np.ndarray"]:
+    """ Extract the sorting columns of a key from a list of entries
+
+    Numeric values are ranked numerically, non-numeric values (ranked by their text representation)
+    come after them & entries missing the key come last.
+    :returns the sorting columns (ascending order, by decreasing priority)
+    """
+    import numpy as np
+
+    path = key.split('.')
+    values = [_lookup(e, path) for e in entries]
+    is_number = np.array([_is_number(v) for v in values], dtype=bool)
+    missing = np.array([v is _MISSING or (isinstance(v, float) and v != v) for v in values], dtype=bool)
+    is_other = ~(is_number | missing)
+
+    numbers = np.array([v if n else 0.0 for v, n in zip(values, is_number)], dtype=float)
+    _, texts = np.unique(
+        np.array([str(v) if o else '' for v, o in zip(values, is_other)], dtype=str), return_inverse=True
+    )
+    texts = texts.reshape(len(values))
+
+    if descending:
+        numbers, texts = -numbers, -texts
+    return [missing, is_other, numbers, texts]
+
+
+class _Reversed:
+    """ Wrapper inverting the ordering of a value """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _entry_sort_key(entry: Dict, sort_keys: List[Tuple[str, bool]]) -> Tuple:
+    """ Sorting key of a single entry, orders entries the same way as rank_order (see _sort_columns) """
+    key = []
+    for dotted_key, descending in sort_keys:
+        value = _lookup(entry, dotted_key.split('.'))
+        is_number = _is_number(value)
+        missing = value is _MISSING or (isinstance(value, float) and value != value)
+        is_other = not (is_number or missing)
+        number = float(value) if is_number else 0.0
+        text = str(value) if is_other else ''
+        if descending:
+            number, text = -number, _Reversed(text)
+        key.extend([missing, is_other, number, text])
+    return tuple(key)
+
+
+class RankedOrder(NamedTuple):
+    """ Result of the ranking of a list of entries """
+    order: "np.ndarray"  # indices of the entries in ranking order
+    rank: "np.ndarray"  # rank of each position, ties share the rank of their first item (1, 2, 2, 4)
+    dense_rank: "np.ndarray"  # rank of each position without gaps (1, 2, 2, 3)
+
+
+def rank_order(entries: List[Dict], sort_keys: List[Tuple[str, bool]]) -> RankedOrder:
+    """ Compute the ranking of a list of entries using multiple sorting keys
+
+    Sorting columns are extracted once, entries missing a key are placed after the others,
+    the order of tied entries is preserved.
+    """
+    import numpy as np
+
+    nb_entries = len(entries)
+    if nb_entries == 0 or not sort_keys:
+        positions = np.arange(nb_entries)
+        return RankedOrder(order=positions, rank=positions + 1, dense_rank=positions + 1)
+
+    columns = []
+    for key, descending in sort_keys:
+        columns.extend(_sort_columns(entries, key, descending))
+
+    # lexsort uses the last key as primary key
+    order = np.lexsort(columns[::-1])
+
+    new_group = np.zeros(nb_entries, dtype=bool)
+    new_group[0] = True
+    for col in columns:
+        sorted_col = col[order]
+        new_group[1:] |= sorted_col[1:] != sorted_col[:-1]
+
+    dense_rank = np.cumsum(new_group)
+    rank = np.maximum.accumulate(np.where(new_group, np.arange(1, nb_entries + 1), 0))
+    return RankedOrder(order=order, rank=rank, dense_rank=dense_rank)
+
+
 def rebuild_leaderboard_index(leaderboard_entries, *, key):
-    """ sort entries by using a specific key and re-write the index with the new ordering """
+    """ sort entries by using a specific key and re-write the index & ranks with the new ordering
 
-    leaderboard_entries = sorted(leaderboard_entries, key=lambda x: misc.key_to_value(x, key=key))
+    :param key: comma separated list of dotted keys (prefix with '-' for descending order)
+    """
+    ranked = rank_order(leaderboard_entries, parse_sort_keys(key))
+    leaderboard_entries = [leaderboard_entries[i] for i in ranked.order]
 
-    for i, entry in enumerate(leaderboard_entries, 1):
-        entry['index'] = i
+    for i, entry in enumerate(leaderboard_entries):
+        entry['index'] = i + 1
+        entry['rank'] = int(ranked.rank[i])
+        entry['dense_rank'] = int(ranked.dense_rank[i])
 
     return leaderboard_entries
 
 
-async def build_leaderboard(*, leaderboard_id: int):
-    leaderboard = await leaderboardQ.get_leaderboard(leaderboard_id=leaderboard_id)
-    leaderboard_entries = []
-    static_location = get_static_location(leaderboard.label)
+async def index_leaderboard_entry(leaderboard: schema.LeaderBoard, submission: schema.ChallengeSubmission,
+                                  scores: Optional[Dict[str, Dict]] = None) -> Dict:
+    """ Load the entry of a submission from disk & store it in the leaderboard entry index
 
-    # create static dir
-    if leaderboard.static_files:
-        static_location.mkdir(exist_ok=True, parents=True)
+    Submissions without an entry file are indexed with an empty entry (they are not re-read by the next builds).
+    :param leaderboard: the leaderboard the entry belongs to
+    :param submission: the submission the entry belongs to
+    :param scores: scores bundle of the submission (loaded from disk if None)
+    :returns the entry (empty if the submission has no entry for this leaderboard)
+    """
+    if scores is None:
+        scores = _fs.leaderboards.load_scores_bundle(submission.id, [leaderboard.entry_file])
+    leaderboard_entry = dict(scores.get(leaderboard.entry_file, {}))
+
+    await leaderboardQ.set_leaderboard_entry(entry=schema.LeaderboardEntry(
+        entry_path=_fs.submissions.get_submission_dir(submission.id) / leaderboard.entry_file,
+        model_id=leaderboard_entry.get('model_id'),
+        submission_id=submission.id,
+        leaderboard_id=leaderboard.id,
+        user_id=submission.user_id,
+        data=leaderboard_entry,
+        submitted_at=submission.submit_date
+    ))
+
+    # if author_label is set use database value over local
+    if submission.author_label and len(leaderboard_entry) > 0:
+        leaderboard_entry['author_label'] = submission.author_label
+    return leaderboard_entry
+
+
+async def load_submission_entries(leaderboard: schema.LeaderBoard,
+                                  indexed: Optional[List[schema.LeaderboardEntry]] = None) -> Dict[str, Dict]:
+    """ Load the entries of all completed submissions of a leaderboard from the entry index
+
+    Completed submissions missing from the index (ex: evaluated before the index existed)
+    are loaded from disk and added to it (empty entries are indexed for submissions without an entry file).
+    :param leaderboard: the leaderboard to load entries for
+    :param indexed: already fetched entries of the leaderboard (fetched from the index if None)
+    :returns a dict mapping submission ids to their entry
+    """
+    if indexed is None:
+        indexed = await leaderboardQ.get_leaderboard_entries(leaderboard_id=leaderboard.id)
+
+    submission_entries = {}
+    for item in indexed:
+        # submission without an entry for this leaderboard
+        if len(item.data) == 0:
+            continue
+        # drop the submission tag of entries indexed by earlier versions (ids are not public)
+        if item.data.get('submission_id') == item.submission_id:
+            item.data.pop('submission_id')
+        # if author_label is set use database value over local
+        if item.author_label:
+            item.data['author_label'] = item.author_label
+        submission_entries[item.submission_id] = item.data
 
-    # load external entries
+    unindexed = await leaderboardQ.list_unindexed_submissions(
+        leaderboard_id=leaderboard.id, challenge_id=leaderboard.challenge_id
+    )
+    for sub in unindexed:
+        leaderboard_entry = await index_leaderboard_entry(leaderboard, sub)
+        if len(leaderboard_entry) > 0:
+            submission_entries[sub.id] = leaderboard_entry
+
+    return submission_entries
+
+
+def load_external_entries(leaderboard: schema.LeaderBoard) -> List[Dict]:
+    """ Load the external entries (baselines, toplines, archived) of a leaderboard
+
+    Parsed entries are cached, unchanged files are not re-parsed.
+    """
     external_entries = [
         *leaderboard.external_entries.rglob('*.json'),
         *leaderboard.external_entries.rglob('*.yaml'),
         *leaderboard.external_entries.rglob('*.yml')
     ]
-    for item in external_entries:
-        leaderboard_entries.append(_fs.commons.load_dict_file(item))
+    return [_fs.leaderboards.load_entry_file(item) for item in external_entries]
 
-    # copy external static files
-    if leaderboard.static_files and (leaderboard.external_entries / 'static').is_dir():
-        _fs.commons.copy_all_contents(leaderboard.external_entries / 'static', static_location)
 
-    if not leaderboard.archived:
-        submission_list = await challengesQ.list_submission(by_track=leaderboard.challenge_id)
-        for sub in submission_list:
-            # skip not completed submissions
-            if sub.status != schema.SubmissionStatus.completed:
-                continue
+async def gather_leaderboard_entries(leaderboard: schema.LeaderBoard,
+                                     indexed: Optional[List[schema.LeaderboardEntry]] = None
+                                     ) -> Tuple[List[Dict], List[Optional[str]], List[Path]]:
+    """ Gather the entries & static files directories of a leaderboard
 
-            # append submission to leaderboard
-            sub_location = _fs.submissions.get_submission_dir(sub.id)
-            leaderboard_entry = _fs.leaderboards.load_entry_from_sub(sub.id, leaderboard.entry_file)
+    :param leaderboard: the leaderboard to gather entries for
+    :param indexed: already fetched entries of the leaderboard (fetched from the index if None)
+    :returns the list of entries, the submission id of each entry (None for external entries)
+        & the list of static files directories
+    """
+    leaderboard_entries = await run_in_threadpool(load_external_entries, leaderboard)
+    submission_keys: List[Optional[str]] = [None] * len(leaderboard_entries)
+    static_sources = []
 
-            # if author_label is set use database value over local
-            if sub.author_label and len(leaderboard_entry) > 0:
-                leaderboard_entry['author_label'] = sub.author_label
+    # external static files
+    if leaderboard.static_files and (leaderboard.external_entries / 'static').is_dir():
+        static_sources.append(leaderboard.external_entries / 'static')
 
+    if not leaderboard.archived:
+        submission_entries = await load_submission_entries(leaderboard, indexed)
+        for sub_id, leaderboard_entry in submission_entries.items():
             # append to leaderboard
             leaderboard_entries.append(leaderboard_entry)
+            submission_keys.append(sub_id)
 
             # grab all static files
             # todo: check is static file section is obsolete ?
+            sub_location = _fs.submissions.get_submission_dir(sub_id)
             if leaderboard.static_files and (sub_location / 'static').is_dir():
-                _fs.commons.copy_all_contents(sub_location / 'static', static_location)
+                static_sources.append(sub_location / 'static')
+
+    return leaderboard_entries, submission_keys, static_sources
+
+
+def compile_leaderboard(leaderboard: schema.LeaderBoard, leaderboard_entries: List[Dict],
+                        submission_keys: List[Optional[str]], static_sources: List[Path]) -> Path:
+    """ Rank the entries, publish static files & write the compiled leaderboard (blocking) """
+    # publish static files (unchanged files are skipped)
+    if leaderboard.static_files:
+        _fs.leaderboards.publish_static_files(static_sources, get_static_location(leaderboard.label))
 
     if leaderboard.sorting_key:
-        try:
-            leaderboard_entries = rebuild_leaderboard_index(leaderboard_entries, key=leaderboard.sorting_key)
-        except KeyError:
-            out.log.error(f"Failed to build index for leaderboard={leaderboard.label} "
-                          f"with sorting_key: {leaderboard.sorting_key}")
+        keys_by_entry = {id(e): k for e, k in zip(leaderboard_entries, submission_keys)}
+        leaderboard_entries = rebuild_leaderboard_index(leaderboard_entries, key=leaderboard.sorting_key)
+        submission_keys = [keys_by_entry[id(e)] for e in leaderboard_entries]
     # Export to file
-    with (_settings.leaderboard_dir / leaderboard.path_to).open('w') as fp:
-        json.dump(dict(
-            updatedOn=datetime.now().isoformat(),
-            data=leaderboard_entries
-        ), fp)
+    return _fs.leaderboards.write_leaderboard(
+        _settings.leaderboard_dir / leaderboard.path_to, leaderboard_entries,
+        keys=dict(sorting_key=leaderboard.sorting_key, submissions=submission_keys)
+    )
+
+
+def merge_leaderboard_entry(leaderboard: schema.LeaderBoard, submission_id: str,
+                            leaderboard_entry: Dict) -> Optional[Path]:
+    """ Insert (or replace) the entry of a submission in the compiled leaderboard (blocking)
+
+    The entry is inserted at its sorted position & ranks are recomputed, other entries are not re-read.
+    An empty entry removes the previous entry of the submission (if any).
+    :returns None if the compiled leaderboard is missing or stale (a full build is needed)
+    """
+    location = _settings.leaderboard_dir / leaderboard.path_to
+    loaded = _fs.leaderboards.load_entry_keys(location)
+    if loaded is None:
+        return None
+    keys, leaderboard_entries = loaded
+    if keys.get('sorting_key') != leaderboard.sorting_key:
+        return None
 
-    return _settings.leaderboard_dir / leaderboard.path_to
+    # drop the previous entry of the submission (re-evaluation)
+    kept = [i for i, k in enumerate(keys['submissions']) if k != submission_id]
+    if len(leaderboard_entry) == 0 and len(kept) == len(leaderboard_entries):
+        return location
+    leaderboard_entries = [leaderboard_entries[i] for i in kept]
+    submission_keys = [keys['submissions'][i] for i in kept]
+
+    # publish static files (unchanged files are skipped)
+    sub_static = _fs.submissions.get_submission_dir(submission_id) / 'static'
+    if len(leaderboard_entry) > 0 and leaderboard.static_files and sub_static.is_dir():
+        _fs.leaderboards.publish_static_files([sub_static], get_static_location(leaderboard.label))
+
+    if not leaderboard.sorting_key:
+        if len(leaderboard_entry) > 0:
+            leaderboard_entries.append(leaderboard_entry)
+            submission_keys.append(submission_id)
+    else:
+        sort_keys = parse_sort_keys(leaderboard.sorting_key)
+        sorting_values = [_entry_sort_key(e, sort_keys) for e in leaderboard_entries]
+        if len(leaderboard_entry) > 0:
+            new_value = _entry_sort_key(leaderboard_entry, sort_keys)
+            # placed after its ties, as a full build does for the most recent submission
+            position = bisect.bisect_right(sorting_values, new_value)
+            leaderboard_entries.insert(position, leaderboard_entry)
+            submission_keys.insert(position, submission_id)
+            sorting_values.insert(position, new_value)
+
+        rank, dense_rank = 0, 0
+        for i, entry in enumerate(leaderboard_entries):
+            if i == 0 or sorting_values[i] != sorting_values[i - 1]:
+                rank, dense_rank = i + 1, dense_rank + 1
+            entry['index'], entry['rank'], entry['dense_rank'] = i + 1, rank, dense_rank
+
+    return _fs.leaderboards.write_leaderboard(
+        location, leaderboard_entries, keys=dict(sorting_key=leaderboard.sorting_key, submissions=submission_keys)
+    )
+
+
+async def _rebuild_leaderboard(leaderboard: schema.LeaderBoard) -> Path:
+    """ Build a leaderboard from all its entries (the leaderboard lock must be held) """
+    leaderboard_entries, submission_keys, static_sources = await gather_leaderboard_entries(leaderboard)
+    return await run_in_threadpool(
+        compile_leaderboard, leaderboard, leaderboard_entries, submission_keys, static_sources
+    )
+
+
+async def build_leaderboard(*, leaderboard_id: int):
+    leaderboard = await leaderboardQ.get_leaderboard(leaderboard_id=leaderboard_id)
+    location = _settings.leaderboard_dir / leaderboard.path_to
+
+    async with _fs.leaderboards.leaderboard_lock(location):
+        return await _rebuild_leaderboard(leaderboard)
+
+
+async def update_leaderboard(*, leaderboard_id: int, submission_id: str, scores: Optional[Dict[str, Dict]] = None):
+    """ Add the entry of a (newly completed) submission to the compiled leaderboard
+
+    The entry is stored in the entry index & merged into the compiled leaderboard,
+    the leaderboard is only fully rebuilt if its compiled file is missing or stale.
+    :param scores: scores bundle of the submission (loaded from disk if None)
+    """
+    leaderboard = await leaderboardQ.get_leaderboard(leaderboard_id=leaderboard_id)
+    location = _settings.leaderboard_dir / leaderboard.path_to
+
+    # archived leaderboards do not accept new submissions
+    if leaderboard.archived:
+        return location
+
+    submission = await challengesQ.get_submission(by_id=submission_id)
+    async with _fs.leaderboards.leaderboard_lock(location):
+        leaderboard_entry = await index_leaderboard_entry(leaderboard, submission, scores)
+        merged = await run_in_threadpool(merge_leaderboard_entry, leaderboard, submission_id, leaderboard_entry)
+        if merged is not None:
+            return merged
+        return await _rebuild_leaderboard(leaderboard)
 
 
 async def get_leaderboard(*, leaderboard_id) -> Dict:
@@ -93,6 +398,130 @@ async def get_leaderboard(*, leaderboard_id) -> Dict:
     return _fs.commons.load_dict_file(_settings.leaderboard_dir / leaderboard.path_to)
 
 
+def get_compiled_leaderboard(location) -> Optional[_fs.leaderboards.CompiledLeaderboard]:
+    """ Load the serialized content (& ETag) of a compiled leaderboard file (cached in memory) """
+    return _fs.leaderboards.load_compiled_leaderboard(location)
+
+
+def project_entry(entry: Dict, fields: List[str]) -> Dict:
+    """ Build a copy of an entry restricted to the given (dotted) fields """
+    result = {}
+    for field in fields:
+        try:
+            value = misc.key_to_value(entry, key=field)
+        except (KeyError, AttributeError):
+            continue
+
+        *parents, last = field.split('.')
+        curr = result
+        for p in parents:
+            curr = curr.setdefault(p, {})
+        curr[last] = value
+    return result
+
+
+def _entry_date(entry: Dict) -> Optional[date]:
+    """ Extract the submission date of an entry """
+    value = entry.get('submission_date')
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).date()
+    except ValueError:
+        return None
+
+
+class LeaderboardIndex:
+    """ In-memory index of the entries of a compiled leaderboard, used to serve queries """
+    # max number of orderings kept per index (least recently used are evicted first)
+    max_orderings = 8
+
+    def __init__(self, etag: str, updated_on: Optional[str], entries: List[Dict]):
+        self.etag = etag
+        self.updated_on = updated_on
+        self.entries = entries
+        self._dates = {id(e): _entry_date(e) for e in entries}
+        self._orderings: "OrderedDict[Tuple, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ordered_by(self, sort_by: Optional[str]) -> List[Dict]:
+        """ Entries ordered by a comma separated list of dotted keys ('-' prefix for descending order)
+
+        Entries missing a key are placed last.
+        """
+        sort_keys = tuple(parse_sort_keys(sort_by or ''))
+        if not sort_keys:
+            return self.entries
+
+        with self._lock:
+            ordering = self._orderings.get(sort_keys)
+            if ordering is not None:
+                self._orderings.move_to_end(sort_keys)
+                return ordering
+
+        ranked = rank_order(self.entries, list(sort_keys))
+        ordering = [self.entries[i] for i in ranked.order]
+        with self._lock:
+            self._orderings[sort_keys] = ordering
+            while len(self._orderings) > self.max_orderings:
+                self._orderings.popitem(last=False)
+        return ordering
+
+    def query(self, *, offset: int = 0, limit: Optional[int] = None, sort_by: Optional[str] = None,
+              fields: Optional[List[str]] = None, author_label: Optional[str] = None,
+              date_from: Optional[date] = None, date_to: Optional[date] = None) -> Tuple[int, List[Dict]]:
+        """ Query the entries of the leaderboard
+
+        :param offset: number of entries to skip
+        :param limit: max number of entries returned
+        :param sort_by: comma separated dotted keys to order entries with ('-' prefix for descending order)
+        :param fields: list of dotted keys to restrict the entries to
+        :param author_label: only keep entries of the given author
+        :param date_from: only keep entries submitted on or after given date
+        :param date_to: only keep entries submitted on or before given date
+        :returns the total number of matching entries & the requested page
+        """
+        entries = self.ordered_by(sort_by)
+
+        if author_label is not None:
+            entries = [e for e in entries if e.get('author_label') == author_label]
+
+        if date_from is not None or date_to is not None:
+            entries = [
+                e for e in entries
+                if self._dates[id(e)] is not None
+                and (date_from is None or date_from <= self._dates[id(e)])
+                and (date_to is None or self._dates[id(e)] <= date_to)
+            ]
+
+        page = entries[offset:] if limit is None else entries[offset:offset + limit]
+        if fields:
+            page = [project_entry(e, fields) for e in page]
+        return len(entries), page
+
+
+# in-process cache of leaderboard indexes (rebuilt when the compiled file changes)
+_leaderboard_indexes: Dict[Path, LeaderboardIndex] = {}
+
+
+def get_leaderboard_index(location: Path) -> Optional[LeaderboardIndex]:
+    """ Load the in-memory index of a compiled leaderboard
+
+    :returns None if the leaderboard was not compiled
+    """
+    compiled = get_compiled_leaderboard(location)
+    if compiled is None:
+        _leaderboard_indexes.pop(location, None)
+        return None
+
+    index = _leaderboard_indexes.get(location)
+    if index is None or index.etag != compiled.etag:
+        data = misc.json_loads(compiled.content)
+        index = LeaderboardIndex(compiled.etag, data.get('updatedOn'), data.get('data', []))
+        _leaderboard_indexes[location] = index
+    return index
+
+
 async def create(*, challenge_id, label, entry_file, external_entries, static_files, path_to, archived):
     """ Create a new leaderboard """
     if external_entries is not None:
@@ -113,8 +542,46 @@ async def create(*, challenge_id, label, entry_file, external_entries, static_fi
     return lead_id
 
 
-async def build_all_challenge(challenge_id: int):
+async def build_all_challenge(challenge_id: int, workers: Optional[int] = None) -> List[Path]:
+    """ Build all the leaderboards of a challenge
+
+    Indexed entries of all leaderboards are fetched in a single query, leaderboards are then
+    compiled concurrently in a thread pool.
+    :param challenge_id: id of the challenge
+    :param workers: number of leaderboards compiled in parallel (defaults to the number of cpus)
+    """
+    leaderboard_list = await leaderboardQ.get_leaderboards(by_challenge_id=challenge_id)
+    if len(leaderboard_list) == 0:
+        return []
+
+    async with AsyncExitStack() as locks:
+        # locks are always taken in the same order (by id) to avoid deadlocks between concurrent builds
+        for ld in sorted(leaderboard_list, key=lambda x: x.id):
+            await locks.enter_async_context(
+                _fs.leaderboards.leaderboard_lock(_settings.leaderboard_dir / ld.path_to)
+            )
+
+        indexed: Dict[int, List[schema.LeaderboardEntry]] = {ld.id: [] for ld in leaderboard_list}
+        for item in await leaderboardQ.get_leaderboard_entries(by_challenge_id=challenge_id):
+            indexed.setdefault(item.leaderboard_id, []).append(item)
+
+        # entries are gathered one leaderboard at a time: tasks would share the database connection
+        # of this task & the backfill of unindexed entries runs transactions on it
+        gathered = [await gather_leaderboard_entries(ld, indexed[ld.id]) for ld in leaderboard_list]
+
+        loop = asyncio.get_running_loop()
+        workers = min(len(leaderboard_list), workers or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(await asyncio.gather(*[
+                loop.run_in_executor(pool, compile_leaderboard, ld, *gathered_entries)
+                for ld, gathered_entries in zip(leaderboard_list, gathered)
+            ]))
+
+
+async def update_all_challenge(challenge_id: int, submission_id: str):
+    """ Merge the entries of a submission into all the leaderboards of a challenge """
     leaderboard_list = await leaderboardQ.get_leaderboards(by_challenge_id=challenge_id)
+    scores = _fs.leaderboards.load_scores_bundle(submission_id, [ld.entry_file for ld in leaderboard_list])
 
     for ld in leaderboard_list:
-        await build_leaderboard(leaderboard_id=ld.id)
+        await update_leaderboard(leaderboard_id=ld.id, submission_id=submission_id, scores=scores)
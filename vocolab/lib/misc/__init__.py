@@ -1,2 +1,4 @@
 from .various_functions import *
 from .various_definitions import *
+from .json_engine import *
+from .caching import *
@@ -0,0 +1,54 @@
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+__all__ = ['TTLCache']
+
+
+class TTLCache:
+    """ Simple in-memory cache whose items expire after a time-to-live
+
+    :param ttl: lifetime of items in seconds
+    :param max_size: maximum number of items kept (oldest items are evicted first)
+    """
+
+    def __init__(self, ttl: float, max_size: Optional[int] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """ Fetch an item from the cache (default if missing or expired) """
+        item = self._items.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._items.pop(key, None)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """ Add an item to the cache """
+        self._items.pop(key, None)
+        self._items[key] = (time.monotonic() + self.ttl, value)
+
+        if self.max_size is not None and len(self._items) > self.max_size:
+            # dicts preserve insertion order: first item is the oldest
+            self._items.pop(next(iter(self._items)))
+
+    def invalidate(self, key: Hashable):
+        """ Remove an item from the cache """
+        self._items.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]):
+        """ Remove all the items whose value matches the predicate """
+        for key in [k for k, (_, v) in self._items.items() if predicate(v)]:
+            self._items.pop(key, None)
+
+    def clear(self):
+        """ Remove all items from the cache """
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
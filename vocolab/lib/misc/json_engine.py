@@ -0,0 +1,70 @@
+""" Pluggable JSON backend
+
+Uses orjson when it is installed and falls back to the standard library json module otherwise.
+"""
+import json
+from datetime import date, datetime, time
+from enum import Enum
+from pathlib import Path
+from typing import Any, Union
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = ['HAS_ORJSON', 'json_dumps', 'json_loads', 'read_json', 'write_json']
+
+HAS_ORJSON = orjson is not None
+
+
+def _default(o):
+    """ Serialization of types not natively supported by the backends
+
+    datetime, date, time, UUID & Enum are handled natively by orjson, they are serialized
+    the same way here so that both backends produce the same output.
+    """
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    elif isinstance(o, UUID):
+        return str(o)
+    elif isinstance(o, Enum):
+        return o.value
+    elif isinstance(o, Path):
+        return str(o)
+    elif isinstance(o, set):
+        return list(o)
+    elif hasattr(o, "dict"):
+        return o.dict()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def json_dumps(obj: Any, *, indent: bool = False) -> bytes:
+    """ Serialize an object into (utf-8 encoded) JSON """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    if indent:
+        return json.dumps(obj, default=_default, indent=2, ensure_ascii=False).encode()
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """ Deserialize a JSON document """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json(location: Path) -> Any:
+    """ Load a JSON file """
+    return json_loads(location.read_bytes())
+
+
+def write_json(location: Path, obj: Any, *, indent: bool = False):
+    """ Write an object to a JSON file """
+    location.write_bytes(json_dumps(obj, indent=indent))
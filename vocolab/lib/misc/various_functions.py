@@ -3,7 +3,7 @@ import base64
 import json
 import shutil
 import subprocess
-from collections import Callable
+from typing import Callable
 from contextlib import contextmanager
 from datetime import datetime, date, time
 from pathlib import Path
@@ -1,5 +1,4 @@
 import asyncio
-import json
 import shlex
 from fastapi import UploadFile
 from pathlib import Path
@@ -8,7 +7,7 @@ from typing import List, Optional
 from vocolab import exc, out, worker
 from vocolab.db import models, schema
 from vocolab.db.q import challengesQ, leaderboardQ
-from vocolab.lib import _fs, leaderboards_lib
+from vocolab.lib import _fs, leaderboards_lib, misc
 from vocolab.settings import get_settings
 
 _settings = get_settings()
@@ -23,11 +22,12 @@ fetch_submission_from_remote = _fs.submissions.fetch_submission_from_remote
 delete_submission_files = _fs.submissions.delete_submission_files
 archive_submission_files = _fs.submissions.archive_submission_files
 SubmissionLogger = _fs.submissions.SubmissionLogger
+load_scores_bundle = _fs.leaderboards.load_scores_bundle
 
 
-def add_part(submission_id: str, filename: str, data: UploadFile):
+def _check_accepts_parts(submission_id: str):
+    """ Verify that a submission exists and is still accepting parts """
     submission_dir = _fs.submissions.get_submission_dir(submission_id, as_obj=True)
-    logger = submission_dir.get_log_handler()
 
     # check existing submission
     if not submission_dir.root.is_dir():
@@ -37,16 +37,65 @@ def add_part(submission_id: str, filename: str, data: UploadFile):
     if not submission_dir.upload_lock.is_file():
         raise exc.InvalidRequest(f"submission ({submission_id}) does not accept any more parts")
 
+    return submission_dir
+
+
+def _claim_upload_completion(submission_dir: _fs.submissions.SubmissionDir) -> bool:
+    """ Remove the upload lock of a submission
+
+    When parts are uploaded in parallel multiple requests can see the upload as completed,
+    removing the lockfile is atomic so only one of them (the one returning True) should finalise it.
+    """
+    try:
+        submission_dir.upload_lock.unlink()
+    except FileNotFoundError:
+        # upload was completed by a concurrent request
+        return False
+    submission_dir.get_log_handler().log(f"Submission upload was completed.")
+    return True
+
+
+def _release_upload_completion(submission_dir: _fs.submissions.SubmissionDir, reason: str):
+    """ Restore the upload lock of a submission whose completion could not be finalised
+
+    The submission accepts parts again, re-sending a part completes the upload once more.
+    """
+    submission_dir.upload_lock.touch()
+    submission_dir.get_log_handler().log(f"Submission upload completion was reverted: {reason}")
+
+
+def add_part(submission_id: str, filename: str, data: UploadFile):
+    submission_dir = _check_accepts_parts(submission_id)
+
     # check if multipart_upload
     if submission_dir.is_multipart():
         completed, expecting_list = _fs.submissions.multipart_add(submission_id, filename, data)
     else:
         completed, expecting_list = _fs.submissions.singlepart_add(submission_id, filename, data)
 
-    # is_completed => remove lock
+    # is_completed => remove lock (only one concurrent request gets to complete the upload)
     if completed:
-        submission_dir.upload_lock.unlink()
-        logger.log(f"Submission upload was completed.")
+        completed = _claim_upload_completion(submission_dir)
+
+    return completed, expecting_list
+
+
+async def add_part_async(submission_id: str, filename: str, data: UploadFile):
+    """ Add a part to a submission without blocking the event loop
+
+    The part is read in chunks from the request, writes/hashing are done in a thread-pool.
+    """
+    submission_dir = _check_accepts_parts(submission_id)
+
+    # check if multipart_upload
+    if submission_dir.is_multipart():
+        completed, expecting_list = await _fs.submissions.multipart_add_async(submission_id, filename, data)
+    else:
+        completed, expecting_list = await _fs.submissions.singlepart_add_async(submission_id, filename, data)
+
+    # is_completed => remove lock (only one concurrent request gets to complete the upload)
+    if completed:
+        completed = _claim_upload_completion(submission_dir)
 
     return completed, expecting_list
 
@@ -54,25 +103,35 @@ def add_part(submission_id: str, filename: str, data: UploadFile):
 def complete_submission(submission_id: str, with_eval: bool = True):
     """ Does the end of upload tasks:
         - merge parts if the upload was multipart
-        - unzip the input archive
+        - unzip the input archive (or extract directly from the parts if stream_unzip is set)
         - mark upload as completed
         - run evaluation function
     : logs to submission logfile
     """
     folder = _fs.submissions.get_submission_dir(submission_id)
     submission_dir = get_submission_dir(submission_id, as_obj=True)
+    logger = submission_dir.get_log_handler()
+    workers = _settings.submission_options.extract_workers
+
+    def extract_progress(nb_extracted: int, nb_total: int):
+        logger.log(f"extracting submission: {nb_extracted}/{nb_total} files")
 
     # check if multipart => merge chunks
     if submission_dir.is_multipart():
-        with submission_dir.multipart_index.open() as fp:
-            mf_data = models.file_split.SplitManifest(**json.load(fp))
-
-        archive = _fs.file_spilt.merge_zip(mf_data, folder)
+        mf_data = models.file_split.SplitManifest(**misc.read_json(submission_dir.multipart_index))
+
+        if _settings.submission_options.stream_unzip:
+            # extract directly from the parts (single thread: parts are verified while they are streamed)
+            _fs.file_spilt.unzip_parts(mf_data, submission_dir.input, workers=1, on_progress=extract_progress)
+            archive = None
+        else:
+            archive = _fs.file_spilt.merge_zip(mf_data, folder)
     else:
         archive = submission_dir.singlepart
 
     # unzip data
-    _fs.commons.unzip(archive, submission_dir.input)
+    if archive is not None:
+        _fs.commons.unzip(archive, submission_dir.input, workers=workers, on_progress=extract_progress)
 
     # mark task as uploaded to the database
     asyncio.run(
@@ -86,6 +145,28 @@ def complete_submission(submission_id: str, with_eval: bool = True):
         )
 
 
+def send_to_ingestion(submission_id: str, with_eval: bool = True):
+    """ Send an uploaded submission to the ingestion queue
+
+    The merge/extraction of the submission & the dispatch of the evaluation (see complete_submission)
+    are run by an ingest worker instead of the API process.
+    If the message cannot be published the upload lock is restored so that the upload can be completed again.
+    """
+    out.cli.debug("sending message to ingest queue")
+    try:
+        worker.ingest.delay(
+            models.tasks.SubmissionIngestMessage(
+                label=f"{submission_id}-ingest",
+                submission_id=submission_id,
+                with_eval=with_eval
+            ).dict()
+        )
+    except Exception as e:
+        submission_dir = _fs.submissions.get_submission_dir(submission_id, as_obj=True)
+        _release_upload_completion(submission_dir, reason=f"could not send to ingestion queue ({e!r})")
+        raise
+
+
 async def evaluate(submission_id: str, extra_args: Optional[List[str]] = None):
     """ Set up a submission to be evaluated by a worker """
     submission_db = await challengesQ.get_submission(by_id=submission_id)
@@ -181,8 +262,8 @@ async def complete_evaluation(submission_id: str, hostname: str, logger: Submiss
     submission_fs.eval_lock.unlink()
     submission = await challengesQ.get_submission(by_id=submission_id)
 
-    # re-build relevant leaderboards
-    await leaderboards_lib.build_all_challenge(submission.track_id)
+    # add submission to relevant leaderboards
+    await leaderboards_lib.update_all_challenge(submission.track_id, submission_id)
     logger.log("api extracted all relevant information for leaderboard")
 
 
@@ -219,17 +300,17 @@ async def archive_leaderboard_entries(submission_id: str):
     """ Archive if possible all leaderboard entries in a submission """
     submission = await challengesQ.get_submission(by_id=submission_id)
     leaderboards = await leaderboardQ.get_leaderboards(by_challenge_id=submission.track_id)
+    scores = _fs.leaderboards.load_scores_bundle(submission_id, [lead.entry_file for lead in leaderboards])
 
     for lead in leaderboards:
         if lead.external_entries is None:
             continue
 
-        lead_entry = _fs.leaderboards.load_entry_from_sub(submission_id, lead.entry_file)
+        lead_entry = dict(scores.get(lead.entry_file, {}))
         if submission.author_label:
             lead_entry['author_label'] = submission.author_label
 
-        with (lead.external_entries / f'{submission_id.replace("-", "")}.json').open("w") as fp:
-            json.dump(lead_entry, fp)
+        misc.write_json(lead.external_entries / f'{submission_id.replace("-", "")}.json', lead_entry)
 
 
 async def multi_archive_leaderboard_entries(*, by_user: Optional[int] = None,
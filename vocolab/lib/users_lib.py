@@ -1,31 +1,100 @@
+import asyncio
 import hashlib
+import hmac
 import os
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
 
+from vocolab import get_settings
 from vocolab.db import models
 from vocolab.lib import _fs
 
+_settings = get_settings()
+
 # export functions
 update_user_data = _fs.users.update_user_data
 get_user_data: Callable[[str], models.api.UserData] = _fs.users.get_user_data
 
+# hashes are stored with their parameters: pbkdf2_sha256$<iterations>$<digest>
+_HASH_PREFIX = b'pbkdf2_sha256$'
+# number of iterations of hashes stored without parameters
+LEGACY_HASH_ITERATIONS = 100000
+
+# pool used to hash passwords outside the event loop (pbkdf2 releases the GIL)
+_hash_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=_settings.user_options.password_hash_workers, thread_name_prefix='pwd-hash'
+        )
+    return _hash_executor
+
+
+def _decode_hash(hashed_pswd: bytes) -> Tuple[int, bytes]:
+    """ Extract the number of iterations & the digest of a stored hash """
+    if hashed_pswd.startswith(_HASH_PREFIX):
+        _, iterations, digest = hashed_pswd.split(b'$', 2)
+        return int(iterations), digest
+    return LEGACY_HASH_ITERATIONS, hashed_pswd
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac(
+        'sha256',  # The hash digest algorithm for HMAC
+        password.encode('utf-8'),  # Convert the password to bytes
+        salt,  # Provide the salt
+        iterations  # It is recommended to use at least 100,000 iterations of SHA-256
+    )
+
 
-def hash_pwd(*, password: str, salt=None):
+def hash_pwd(*, password: str, salt=None, iterations: Optional[int] = None):
     """ Creates a hash of the given password.
         If salt is None generates a random salt.
 
     :arg password<str> the password to hash
     :arg salt<bytes> a value to salt the hashing
-    :returns hashed_password, salt
+    :arg iterations<int> number of iterations (defaults to user_options.password_iterations)
+    :returns hashed_password (prefixed with its parameters), salt
     """
 
     if salt is None:
         salt = os.urandom(32)  # make random salt
 
-    hash_pass = hashlib.pbkdf2_hmac(
-        'sha256',  # The hash digest algorithm for HMAC
-        password.encode('utf-8'),  # Convert the password to bytes
-        salt,  # Provide the salt
-        100000  # It is recommended to use at least 100,000 iterations of SHA-256
+    if iterations is None:
+        iterations = _settings.user_options.password_iterations
+
+    hash_pass = _pbkdf2(password, salt, iterations)
+    return _HASH_PREFIX + f"{iterations}$".encode() + hash_pass, salt
+
+
+def check_pwd(*, password: str, hashed_pswd: bytes, salt: bytes) -> bool:
+    """ Verify a password against a stored hash (using the parameters stored with the hash) """
+    iterations, digest = _decode_hash(hashed_pswd)
+    return hmac.compare_digest(_pbkdf2(password, salt, iterations), digest)
+
+
+def needs_rehash(hashed_pswd: bytes) -> bool:
+    """ Check if a stored hash was created with different parameters than the current ones """
+    if not hashed_pswd.startswith(_HASH_PREFIX):
+        return True
+    iterations, _ = _decode_hash(hashed_pswd)
+    return iterations != _settings.user_options.password_iterations
+
+
+async def hash_pwd_async(*, password: str, salt=None, iterations: Optional[int] = None):
+    """ Same as hash_pwd, running in the password hashing pool """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_hash_executor(), lambda: hash_pwd(password=password, salt=salt, iterations=iterations)
+    )
+
+
+async def check_pwd_async(*, password: str, hashed_pswd: bytes, salt: bytes) -> bool:
+    """ Same as check_pwd, running in the password hashing pool """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_hash_executor(), lambda: check_pwd(password=password, hashed_pswd=hashed_pswd, salt=salt)
     )
-    return hash_pass, salt
@@ -1,3 +1,4 @@
 from .echo import echo_fn
 from .update import update_task_fn
 from .eval import evaluate_submission_fn
+from .ingest import ingest_submission_fn
@@ -0,0 +1,17 @@
+from vocolab import out, get_settings
+from vocolab.db.models import tasks
+from vocolab.lib import submissions_lib
+
+_settings = get_settings()
+
+
+def ingest_submission_fn(sim: tasks.SubmissionIngestMessage):
+    """ Finalise an uploaded submission (merge parts, extract & send to evaluation) """
+    try:
+        submissions_lib.complete_submission(sim.submission_id, with_eval=sim.with_eval)
+    except Exception as e:
+        with submissions_lib.SubmissionLogger(sim.submission_id) as lg:
+            lg.log(f"(ERROR) ingestion of submission failed: {e}")
+        raise
+
+    out.log.info(f"Ingestion of {sim.submission_id} was completed successfully")
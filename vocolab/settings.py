@@ -40,12 +40,32 @@ class ConsoleOutputSettings(BaseModel):
 
 class DatabaseSettings(BaseModel):
     db_file: str = 'vocolab.db'
+    # number of idle connections kept open for re-use
+    pool_size: int = 8
+    # sqlite tuning (applied on every connection)
+    journal_mode: str = 'WAL'  # WAL allows readers to run concurrently with a writer
+    synchronous: str = 'NORMAL'
+    busy_timeout: int = 5000  # time (ms) to wait for a lock before failing with 'database is locked'
+    mmap_size: int = 256 * 1024 * 1024
+    # lifetime of cached metadata (challenges, evaluators, leaderboards)
+    metadata_cache_ttl: timedelta = timedelta(minutes=5)
+    # delay between checks of the cache version table (bounds staleness across processes)
+    metadata_cache_check: timedelta = timedelta(seconds=2)
+
+    def sqlite_pragmas(self) -> List[str]:
+        return [
+            f"journal_mode={self.journal_mode}",
+            f"synchronous={self.synchronous}",
+            f"busy_timeout={self.busy_timeout}",
+            f"mmap_size={self.mmap_size}",
+        ]
 
 
 class CeleryWorkerOptions(BaseModel):
     celery_bin: Path = Path(shutil.which('celery'))
     celery_nodes: Dict[str, str] = {
-        'eval': 'vc-evaluate-node', 'update': 'vc-update-node', 'echo': 'vc-echo-node'
+        'eval': 'vc-evaluate-node', 'update': 'vc-update-node', 'echo': 'vc-echo-node',
+        'ingest': 'vc-ingest-node'
     }
     celery_app: str = 'vocolab.worker.server:app'
     celery_pool_type: str = "prefork"
@@ -59,14 +79,15 @@ class TaskQueueSettings(BaseModel):
     RPC_VHOST: str = "vocolab"
     RPC_PORT: int = 5672
     RPC_CHANNELS: Dict[str, str] = dict(
-        eval="vocolab-eval", update="vocolab-update", echo="vocolab-msg"
+        eval="vocolab-eval", update="vocolab-update", echo="vocolab-msg", ingest="vocolab-ingest"
     )
 
     # Queue Channels
     QUEUE_CHANNELS: Dict[str, str] = {
         "eval": 'evaluation-queue',
         'update': 'update-queue',
-        'echo': 'echo-queue'
+        'echo': 'echo-queue',
+        'ingest': 'ingest-queue'
     }
 
     # Remote Settings
@@ -140,6 +161,7 @@ class ServerSettings(BaseModel):
     GUNICORN_WORKERS: int = 4
     EVAL_WORKERS: int = 4
     UPDATE_WORKERS: int = 2
+    INGEST_WORKERS: int = 2
 
 
 class UserSettings(BaseModel):
@@ -148,6 +170,23 @@ class UserSettings(BaseModel):
     # submission quotas
     max_submissions: int = 1
     submission_interval: timedelta = timedelta(days=1)
+    # lifetime of cached users (used to validate sessions without a database query)
+    cache_ttl: timedelta = timedelta(seconds=60)
+    # delay between checks of the users cache version (changes made by other processes can be missed
+    # for this long, sessions of disabled users remain valid during that time)
+    cache_check: timedelta = timedelta(0)
+    # number of PBKDF2 iterations for new password hashes (older hashes are upgraded on login)
+    password_iterations: int = 100000
+    # number of threads used to hash passwords
+    password_hash_workers: int = 4
+
+
+class SubmissionSettings(BaseModel):
+    # extract multipart submissions directly from their parts (skips writing the merged archive)
+    stream_unzip: bool = False
+    # number of threads used to extract merged/singlepart submission archives
+    # (stream_unzip always extracts with one thread to verify the parts in a single pass)
+    extract_workers: int = 1
 
 
 class _VocoLabSettings(BaseSettings):
@@ -165,6 +204,7 @@ class _VocoLabSettings(BaseSettings):
     notify_options: NotifySettings = NotifySettings()
     server_options: ServerSettings = ServerSettings()
     user_options: UserSettings = UserSettings()
+    submission_options: SubmissionSettings = SubmissionSettings()
     database_options: DatabaseSettings = DatabaseSettings()
 
     CUSTOM_TEMPLATES_DIR: Optional[Path] = None
@@ -224,12 +264,7 @@ class _VocoLabSettings(BaseSettings):
 
     @property
     def secret(self):
-        if not (self.DATA_FOLDER / '.secret').is_file():
-            with (self.DATA_FOLDER / '.secret').open("wb") as fp:
-                fp.write(secrets.token_hex(256).encode())
-
-        with (self.DATA_FOLDER / '.secret').open('rb') as fp:
-            return fp.read().decode()
+        return _load_secret(self.DATA_FOLDER)
 
 
 
@@ -239,6 +274,17 @@ class _VocoLabSettings(BaseSettings):
         env_file_encoding = 'utf-8'
 
 
+@lru_cache()
+def _load_secret(data_folder: Path) -> str:
+    """ Load the secret (created if missing), cached to only be read once per process """
+    if not (data_folder / '.secret').is_file():
+        with (data_folder / '.secret').open("wb") as fp:
+            fp.write(secrets.token_hex(256).encode())
+
+    with (data_folder / '.secret').open('rb') as fp:
+        return fp.read().decode()
+
+
 @lru_cache()
 def get_settings() -> _VocoLabSettings:
     """ Getter for api settings
@@ -1,3 +1,3 @@
-from .server import echo, update, evaluate
+from .server import echo, update, evaluate, ingest
 
 
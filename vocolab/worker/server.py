@@ -20,7 +20,8 @@ app.conf.update({
     'task_routes': {
         'echo-task': {'queue': _settings.task_queue_options.QUEUE_CHANNELS['echo']},
         'update-task': {'queue': _settings.task_queue_options.QUEUE_CHANNELS['update']},
-        'eval-task': {'queue': _settings.task_queue_options.QUEUE_CHANNELS['eval']}
+        'eval-task': {'queue': _settings.task_queue_options.QUEUE_CHANNELS['eval']},
+        'ingest-task': {'queue': _settings.task_queue_options.QUEUE_CHANNELS['ingest']}
     },
     'task_ignore_result': True
 })
@@ -44,3 +45,10 @@ def evaluate(sem: Dict):
     sem = tasks.SubmissionEvaluationMessage(**sem)
     out.log.log(f'evaluating {sem.submission_id}')
     worker_lib.tasks.evaluate_submission_fn(sem)
+
+
+@app.task(name='ingest-task', ignore_result=True)
+def ingest(sim: Dict):
+    sim = tasks.SubmissionIngestMessage(**sim)
+    out.log.log(f'ingesting {sim.submission_id}')
+    worker_lib.tasks.ingest_submission_fn(sim)